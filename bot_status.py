@@ -1,100 +1,187 @@
-import discord
 import asyncio
-import signal
+import json
+import os
+
+import discord
 
-from config import bot, bot_token
+from config import bot
 from constants import STATUS_CHANNEL_NAMES
 
-status_message = None
+# Where each guild's status message lives, so restarts edit it instead of purging and re-sending
+STATUS_MESSAGES_FILE = "status_messages.json"
+# Guilds set up at the same time on startup
+STATUS_GUILD_CONCURRENCY = 5
+# Time allowed for marking every guild offline, inside the process supervisor's stop grace period
+SHUTDOWN_STATUS_DEADLINE_SECONDS = 8
+
+ONLINE_MESSAGE = "Rank tracker is online 🟢"
+OFFLINE_MESSAGE = "Rank tracker is offline 🔴"
+
+class StatusRegistry:
+    """guild_id -> (channel_id, message_id) of each guild's status message, persisted to disk.
 
-@bot.event
+    Resume and shutdown go straight to the stored IDs instead of searching every
+    guild's channels for the status channel.
+    """
+
+    def __init__(self, path=STATUS_MESSAGES_FILE):
+        self.path = path
+        self._entries = {}
+        self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        try:
+            with open(self.path, "r") as file:
+                stored = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            stored = {}
+        self._entries = {
+            int(guild_id): (entry["channel_id"], entry["message_id"])
+            for guild_id, entry in stored.items()
+            if isinstance(entry, dict)
+        }
+
+    def save(self):
+        stored = {
+            str(guild_id): {"channel_id": channel_id, "message_id": message_id}
+            for guild_id, (channel_id, message_id) in self._entries.items()
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(stored, file, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def get(self, guild_id):
+        return self._entries.get(guild_id)
+
+    def set(self, guild_id, channel_id, message_id):
+        self._entries[guild_id] = (channel_id, message_id)
+
+    def remove(self, guild_id):
+        return self._entries.pop(guild_id, None) is not None
+
+    def items(self):
+        return list(self._entries.items())
+
+status_registry = StatusRegistry()
+
+async def init_guild_status(guild):
+    """Finds (or creates) the guild's status channel and leaves a single online message in it."""
+    print(f"Checking guild: {guild.name} (ID: {guild.id})")
+
+    # Find the status channel by any of the possible names
+    channel = discord.utils.find(
+        lambda c: c.name in STATUS_CHANNEL_NAMES, guild.text_channels
+    )
+    if channel:
+        print(f"Found channel: {channel.name} (ID: {channel.id}) in guild: {guild.name}")
+    else:
+        print(f"Channel '{STATUS_CHANNEL_NAMES[0]}' not found in guild '{guild.name}', creating it.")
+        # Create the channel if it doesn't exist
+        overwrites = {
+            guild.default_role: discord.PermissionOverwrite(read_messages=False),
+            guild.me: discord.PermissionOverwrite(read_messages=True),
+        }
+        channel = await guild.create_text_channel(STATUS_CHANNEL_NAMES[0], overwrites=overwrites)
+        print(f"Created channel '{STATUS_CHANNEL_NAMES[0]}' in guild '{guild.name}'.")
+
+    # Rename the channel to indicate the bot is online (renames are tightly rate limited, skip if already done)
+    if channel.name != "🟢bot-status":
+        await channel.edit(name="🟢bot-status")
+        print(f"Channel renamed to 🟢bot-status in guild '{guild.name}'.")
+
+    # Reuse the message from the last run if it's still there
+    message = None
+    entry = status_registry.get(guild.id)
+    if entry and entry[0] == channel.id:
+        try:
+            message = await channel.fetch_message(entry[1])
+            await message.edit(content=ONLINE_MESSAGE)
+            print(f"Status message updated in channel: {channel.name}")
+        except discord.NotFound:
+            message = None
+
+    # Delete everything else; purge bulk-deletes messages under 14 days old and only deletes older ones one by one
+    keep_id = message.id if message else None
+    await channel.purge(limit=None, check=lambda m: m.id != keep_id)
+
+    if message is None:
+        # Send the "Rank tracker is online" message
+        message = await channel.send(ONLINE_MESSAGE)
+        print(f"Status message sent in channel: {channel.name}")
+    status_registry.set(guild.id, channel.id, message.id)
+
+@bot.listen("on_ready")
 async def on_ready():
-    global status_message
     print(f'Logged in as {bot.user}')
     print("Bot is ready, checking guilds...")
 
-    # Iterate through guilds the bot is in
-    for guild in bot.guilds:
-        print(f"Checking guild: {guild.name} (ID: {guild.id})")
-
-        # Find the status channel by any of the possible names
+    slots = asyncio.Semaphore(STATUS_GUILD_CONCURRENCY)
+
+    async def init(guild):
+        async with slots:
+            try:
+                await init_guild_status(guild)
+            except Exception as e:
+                print(f"Error processing guild '{guild.name}': {e}")
+
+    await asyncio.gather(*(init(guild) for guild in bot.guilds))
+    status_registry.save()
+
+@bot.listen("on_guild_remove")
+async def forget_guild_status(guild):
+    if status_registry.remove(guild.id):
+        status_registry.save()
+
+async def set_guild_status(guild_id, channel_id, message_id, online):
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        print(f"Status channel {channel_id} of guild {guild_id} not found.")
+        return
+    try:
+        await channel.get_partial_message(message_id).edit(content=ONLINE_MESSAGE if online else OFFLINE_MESSAGE)
+    except Exception as e:
+        print(f"Error updating status in guild '{channel.guild.name}': {e}")
+    if not online:
+        # Rename the channel to indicate the bot is offline. Channel renames are limited to 2 per
+        # 10 minutes, so this can sit on a 429 until the shutdown deadline; the message is already updated
         try:
-            channel = discord.utils.find(
-                lambda c: c.name in STATUS_CHANNEL_NAMES, guild.text_channels
-            )
-            if channel:
-                print(f"Found channel: {channel.name} (ID: {channel.id}) in guild: {guild.name}")
-            else:
-                print(f"Channel '{STATUS_CHANNEL_NAMES[0]}' not found in guild '{guild.name}', creating it.")
-                # Create the channel if it doesn't exist
-                overwrites = {
-                    guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                    guild.me: discord.PermissionOverwrite(read_messages=True),
-                }
-                channel = await guild.create_text_channel(STATUS_CHANNEL_NAMES[0], overwrites=overwrites)
-                print(f"Created channel '{STATUS_CHANNEL_NAMES[0]}' in guild '{guild.name}'.")
-
-            # Rename the channel to indicate the bot is online
-            await channel.edit(name="🟢bot-status")
-            print(f"Channel renamed to 🟢bot-status in guild '{guild.name}'.")
-
-            # Delete all previous messages in the channel
-            async for message in channel.history(limit=None):
-                await message.delete()
-
-            # Send the "Rank tracker is online" message
-            status_message = await channel.send("Rank tracker is online 🟢")
-            print(f"Status message sent in channel: {channel.name}")
+            await channel.edit(name="🔴bot-status")
         except Exception as e:
-            print(f"Error processing guild '{guild.name}': {e}")
-
-@bot.event
-async def on_resume():
-    global status_message
+            print(f"Error renaming status channel in guild '{channel.guild.name}': {e}")
+
+async def set_status(online, timeout=None):
+    """Updates every registered guild's status at once. Returns False if the timeout ran out first."""
+    updates = [
+        asyncio.create_task(set_guild_status(guild_id, channel_id, message_id, online))
+        for guild_id, (channel_id, message_id) in status_registry.items()
+    ]
+    if not updates:
+        return True
+    done, pending = await asyncio.wait(updates, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    return not pending
+
+@bot.listen("on_resumed")
+async def on_resumed():
     print("Bot reconnected")
-    if status_message:
-        try:
-            await status_message.edit(content="Rank tracker is online 🟢")
-            print("Status message updated to online.")
-        except Exception as e:
-            print(f"Error updating status message: {e}")
+    await set_status(online=True)
+    print("Status messages updated to online.")
 
 async def close_bot():
-    global status_message
     print("Shutting down bot...")
 
-    for guild in bot.guilds:
-        try:
-            # Find the channel by any of the possible names
-            channel = discord.utils.find(
-                lambda c: c.name in STATUS_CHANNEL_NAMES, guild.text_channels
-            )
-            if channel:
-                # Rename the channel to indicate the bot is offline
-                await channel.edit(name="🔴bot-status")
-                print(f"Channel renamed to 🔴bot-status in guild '{guild.name}'.")
-
-                # Update status message to offline
-                if status_message:
-                    await status_message.edit(content="Rank tracker is offline 🔴")
-                    print("Status message updated to offline.")
-            else:
-                print(f"No status channel found in guild '{guild.name}'.")
-        except Exception as e:
-            print(f"Error processing guild '{guild.name}': {e}")
+    if await set_status(online=False, timeout=SHUTDOWN_STATUS_DEADLINE_SECONDS):
+        print(f"Status set to offline in {len(status_registry)} guilds.")
+    else:
+        print(f"Status update didn't finish within {SHUTDOWN_STATUS_DEADLINE_SECONDS}s, closing anyway.")
 
     await bot.close()
 
-def shutdown_signal_handler(signal, frame):
-    print("Received shutdown signal. Shutting down gracefully...")
-    asyncio.create_task(close_bot())
-
-# Set up signal handling for termination (Ctrl+C or closing the terminal)
-signal.signal(signal.SIGINT, shutdown_signal_handler)
-signal.signal(signal.SIGTERM, shutdown_signal_handler)
-
-async def main():
-    await bot.start(bot_token)
-
-if __name__ == "__main__":
-    asyncio.run(main())
+async def setup(bot):
+    # The status listeners are registered on config.bot when this module is imported
+    pass
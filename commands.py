@@ -1,16 +1,21 @@
 import random
+import asyncio
 import discord
 from discord import app_commands
 from discord.ui import Button, View
 from typing import Optional
 
-from constants import INSTRUMENT_CHOICES, DECAY_RATE, INSTRUMENT_THRESHOLDS, RANK_EMOJI, INSTRUMENTS, GUILD_ID
+from constants import INSTRUMENT_CHOICES, DECAY_RATE, INSTRUMENT_THRESHOLDS, RANK_EMOJI, GUILD_ID
 from config import  bot_token, bot
 
-from discord_utils import username_autocomplete, song_name_autocomplete, pending_scores
+from discord_utils import username_autocomplete, song_name_autocomplete
+from role_sync import role_sync_queue
 from ranking_utils import determine_rank, calculate_normalized_score, calculate_final_rank, reverse_normalized_score, get_user_instrument_data, get_song_metadata, calculate_notes
-from json_utils import save_data, load_player_data, load_song_info, save_song_info
-from image_processing import extract_data_async
+from json_utils import save_data, load_player_data, save_song_info, get_song_catalog, get_leaderboards, get_ranking_engine, get_standings, write_coordinator, run_compactor
+from rerank import collect_scores, compute_ranks, apply_ranks
+from standings import FINAL_RANK, NAMED_RANK_AVERAGE
+from image_processing import ocr_service
+from verification_queue import verification_queue, PRIORITY_HIGH_SCORE, PRIORITY_DEFAULT
 
 from embed_buttons import SongsPaginationView, LeaderboardPaginationView
 
@@ -22,11 +27,20 @@ from embed_buttons import SongsPaginationView, LeaderboardPaginationView
     #   a user's score)
 
 
-@bot.event
+background_tasks = []
+
+@bot.listen("on_ready")
 async def on_ready():
     try:
         print(f"Logged in as {bot.user}")
 
+        # on_ready fires again after reconnects, only start background tasks once
+        if not background_tasks:
+            background_tasks.append(asyncio.create_task(run_compactor()))
+            background_tasks.append(asyncio.create_task(role_sync_queue.run(bot)))
+            ocr_service.start()
+            background_tasks.append(asyncio.create_task(verification_queue.run(bot)))
+
         guild = discord.Object(id=GUILD_ID)
 
         # Sync only the intended commands
@@ -45,25 +59,20 @@ async def add(interaction: discord.Interaction, song_name: str):
     try:
         print("Add command executed")
 
-        # Load the existing database
-        data = load_song_info()
+        song_catalog = get_song_catalog()
 
         # Check if the song already exists across all instruments
-        song_exists = any(song_name in data.get(instrument, {}) for instrument in INSTRUMENTS)
+        song_exists = song_catalog.has_song(song_name)
 
         if song_exists:
             await interaction.response.send_message(f"Song '{song_name}' already exists in the database.", ephemeral=True)
             return
 
         # Add the song to all instruments
-        for instrument in INSTRUMENTS:
-            if instrument not in data:
-                data[instrument] = {}
-
-            data[instrument][song_name] = {"difficulty": "X"}
+        song_catalog.add_song(song_name)
 
         # Save the updated database
-        save_song_info(data)
+        save_song_info(song_catalog.song_info)
 
         await interaction.response.send_message(f"Song '{song_name}' added to all instruments.")
     
@@ -106,25 +115,23 @@ async def submit(interaction: discord.Interaction, instrument: str, song_name: s
     instrument_lower = instrument.lower()
     song_name_lower = song_name.lower()
 
-    # Load song info
-    song_info = load_song_info()
+    song_catalog = get_song_catalog()
 
     # Validate instrument
-    if instrument_lower not in (key.lower() for key in song_info.keys()):
+    if song_catalog.instrument_key(instrument_lower) is None:
         embed = discord.Embed(title="⛔ Error", description=f"The instrument `{instrument}` is not recognized.", color=discord.Color.red())
         await interaction.followup.send(embed=embed)
         return
 
-    instrument_data = next((key for key in song_info if key.lower() == instrument_lower), None)
-    song_data = next((key for key in song_info[instrument_data] if key.lower() == song_name_lower), None)
+    song_data = song_catalog.get(instrument_lower, song_name)
 
     if song_data is None:
         embed = discord.Embed(title="⛔ Error", description=f"`{song_name}` was not found for `{instrument}`. You can add the song with /add_song", color=discord.Color.red())
         await interaction.followup.send(embed=embed)
         return
     
-    correct_song_name = song_data
-    difficulty = song_info[instrument_data][correct_song_name].get("difficulty", "X")
+    correct_song_name = song_catalog.canonical_name(song_name)
+    difficulty = song_data.get("difficulty", "X")
 
     if difficulty == "X":
         embed = discord.Embed(title="📏 Enter Difficulty", description="Please enter the difficulty (1-7): (Help at https://www.gamespot.com/gallery/every-fortnite-festival-song-sorted-by-difficulty/2900-5620/#4)", color=discord.Color.blue())
@@ -132,8 +139,8 @@ async def submit(interaction: discord.Interaction, instrument: str, song_name: s
         try:
             response = await bot.wait_for("message", check=lambda m: m.author == interaction.user, timeout=120.0)
             difficulty = float(response.content.strip())
-            song_info[instrument_data][correct_song_name]["difficulty"] = difficulty
-            save_song_info(song_info)
+            song_catalog.set_song(instrument_lower, correct_song_name, difficulty=difficulty)
+            save_song_info(song_catalog.song_info)
         except Exception:
             embed = discord.Embed(title="⛔ Error", description="Difficulty input timed out or was invalid.", color=discord.Color.red())
             await interaction.followup.send(embed=embed)
@@ -166,8 +173,8 @@ async def submit(interaction: discord.Interaction, instrument: str, song_name: s
 
 
     total_notes = int(perfect + good + missed + striked)
-    song_info[instrument_data][correct_song_name]["total_notes"] = total_notes
-    save_song_info(song_info)
+    song_catalog.set_song(instrument_lower, correct_song_name, total_notes=total_notes)
+    save_song_info(song_catalog.song_info)
 
     # Request image proof
     embed = discord.Embed(title="📷 Upload Image Proof", description="Please upload an image as proof of your score. ", color=discord.Color.blue())
@@ -229,22 +236,21 @@ async def submit(interaction: discord.Interaction, instrument: str, song_name: s
 
     await interaction.followup.send(embed=embed)
 
-    # Perform OCR extraction
-    extracted_perfect, extracted_good, extracted_missed, extracted_striked = await extract_data_async(image_url, perfect, good, missed, striked)
+    # OCR runs in the background, the result is posted in this channel when it's done
+    position = verification_queue.enqueue(
+        guild.id, interaction.channel_id, interaction.user.id, player_id, submitter_username,
+        instrument, correct_song_name, (perfect, good, missed, striked), image_url, embed,
+        priority=PRIORITY_HIGH_SCORE if normalized_score > previous_score else PRIORITY_DEFAULT,
+    )
+    await interaction.followup.send(f"Image queued for verification (position {position}).")
 
-    if (extracted_perfect, extracted_good, extracted_missed, extracted_striked) == (perfect, good, missed, striked):
-        await interaction.followup.send("Image verified successfully!")
-    else:
-        await interaction.followup.send("Image verification failed.")
-        await pending_scores(embed, guild, player_id, submitter_username, instrument, song_name, perfect, good, missed, striked)
-        
 @bot.tree.command(name="role_rank", description="View the named rank and top 5 scores breakdown for a user on an instrument.")
 @app_commands.autocomplete(username=username_autocomplete)
 @app_commands.choices(instrument=INSTRUMENT_CHOICES)  # Restrict instrument input to specific choices
 async def namedrank(interaction: discord.Interaction, username: str, instrument: str):
     try:
         data = load_player_data()
-        song_info = load_song_info() 
+        song_catalog = get_song_catalog()
 
         user_data = get_user_instrument_data(username, instrument, data)
         if not user_data or "songs" not in user_data:
@@ -271,14 +277,9 @@ async def namedrank(interaction: discord.Interaction, username: str, instrument:
             if next_rank else "You've reached the highest rank!"
         )
 
-        # Normalize song_info keys for case-insensitive matching
-        normalized_song_info = {
-            k.lower(): {song.lower().strip(): v for song, v in v.items()} for k, v in song_info.items()
-        }
-
         song_details = ""
         for i, (song_name, score) in enumerate(top_5_scores, start=1):
-            song_metadata = get_song_metadata(song_name, instrument, normalized_song_info)
+            song_metadata = get_song_metadata(song_name, instrument, song_catalog)
             difficulty = song_metadata.get("difficulty", "Unknown")  # Extract difficulty
             perfect, good = calculate_notes(score, song_metadata)
             song_details += f"**{i}.** {song_name} — **{score} pts**\n **Difficulty:** {difficulty} | **Perfect:** {perfect} | **Good:** {good}\n\n"
@@ -292,6 +293,15 @@ async def namedrank(interaction: discord.Interaction, username: str, instrument:
         embed.add_field(name="🏅 Named Rank", value=f"{named_rank_emoji} **{named_rank.capitalize()}**\n•", inline=False)
         embed.add_field(name="📊 Average Top 5 Score", value=f"**{average_top_5:.2f}**\n•", inline=True)
         embed.add_field(name="🎯 Rank Progress", value=next_rank_message + "\n•", inline=False)
+        standings = get_standings()
+        player_id = standings.player_id(username)
+        standing = standings.standing(player_id, instrument, NAMED_RANK_AVERAGE) if player_id else None
+        if standing:
+            embed.add_field(
+                name="📍 Standing",
+                value=f"**#{standing.position}** of {standing.total} by top 5 average (top {standing.top_percent:.1f}%)\n•",
+                inline=False,
+            )
         embed.add_field(name="📈 Rank Thresholds", value=(threshold_text if threshold_text else "No thresholds available.") + "\n•", inline=False)
         embed.add_field(name="🎶 Top 5 Scores", value=(song_details if song_details else "No scores recorded."), inline=False)
 
@@ -300,6 +310,46 @@ async def namedrank(interaction: discord.Interaction, username: str, instrument:
     except Exception as e:
         await interaction.response.send_message(f"⚠️ Error retrieving named rank: {e}", ephemeral=True)
 
+@bot.tree.command(name="standing", description="See where a player stands on an instrument and who is around them.")
+@app_commands.autocomplete(username=username_autocomplete)
+@app_commands.choices(instrument=INSTRUMENT_CHOICES)
+async def standing(interaction: discord.Interaction, username: str, instrument: str):
+    try:
+        standings = get_standings()
+        player_id = standings.player_id(username)
+        final_standing = standings.standing(player_id, instrument, FINAL_RANK) if player_id else None
+        named_standing = standings.standing(player_id, instrument, NAMED_RANK_AVERAGE) if player_id else None
+        if not final_standing and not named_standing:
+            await interaction.response.send_message(f"{username} isn't ranked on {instrument} yet.", ephemeral=True)
+            return
+
+        data = load_player_data()
+        embed = discord.Embed(
+            title=f"📍 Standing for {username}",
+            description=f"🎵 **Instrument:** {instrument.capitalize()}",
+            color=discord.Color.blue()
+        )
+
+        for label, board_standing in (("🏆 Final Rank Score", final_standing), ("🏅 Top 5 Average", named_standing)):
+            if not board_standing:
+                continue
+            neighbours = "\n".join(
+                f"{'➡️ ' if other_id == player_id else ''}**#{position}** {data.get(other_id, {}).get('username', f'User {other_id}')} — {score:.2f}"
+                for other_id, score, position in board_standing.neighbours
+            )
+            embed.add_field(
+                name=label,
+                value=f"**#{board_standing.position}** of {board_standing.total} — **{board_standing.score:.2f}**\n"
+                      f"Top {board_standing.top_percent:.1f}% (ahead of {board_standing.percentile:.1f}% of players)\n\n"
+                      f"{neighbours}\n•",
+                inline=False,
+            )
+
+        await interaction.response.send_message(embed=embed)
+
+    except Exception as e:
+        await interaction.response.send_message(f"⚠️ Error retrieving standing: {e}", ephemeral=True)
+
 @bot.tree.command(name="leaderboard", description="Display top player scores, optionally filtered by instrument.")
 @app_commands.choices(instrument=INSTRUMENT_CHOICES)
 async def leaderboard(interaction: discord.Interaction, instrument: str = None):
@@ -311,48 +361,13 @@ async def leaderboard(interaction: discord.Interaction, instrument: str = None):
             await interaction.followup.send("No player data available.", ephemeral=True)
             return
 
-        song_info = load_song_info()  # Load song metadata
-        players = []
+        # Materialized leaderboard, pages are built lazily by the view
+        players_sorted = get_leaderboards().rows(instrument)
 
-        normalized_song_info = {
-            k.lower(): {song.lower().strip(): v for song, v in v.items()} for k, v in song_info.items()
-        }
-        for player_id, player_data in data.items():
-            username = player_data.get("username", f"User {player_id}")
-            highest_score = None
-            best_song = None
-            best_perfect = 0
-            best_good = 0
-
-            for key, instrument_data in player_data.items():
-                if not isinstance(instrument_data, dict) or "songs" not in instrument_data:
-                    continue
-                
-                if instrument and key.lower() != instrument.lower():
-                    continue
-                
-                for song_name, score in instrument_data["songs"].items():
-                    song_metadata = get_song_metadata(song_name, key, normalized_song_info)
-                    if not song_metadata:
-                        continue
-                    
-                    perfect, good = calculate_notes(score, song_metadata)  # Correct note calculation
-                    
-                    if highest_score is None or score > highest_score:
-                        highest_score = score
-                        best_song = song_name
-                        best_perfect = perfect
-                        best_good = good
-            
-            if highest_score is not None:
-                players.append((username, highest_score, best_song, best_perfect, best_good))
-
-        if not players:
+        if not players_sorted:
             await interaction.followup.send("No scores found.", ephemeral=True)
             return
 
-        players_sorted = sorted(players, key=lambda x: x[1], reverse=True)
-
         # Create the leaderboard pagination view
         view = LeaderboardPaginationView(players_sorted, instrument)
         embed = view.generate_embed()
@@ -370,11 +385,7 @@ async def leaderboard(interaction: discord.Interaction, instrument: str = None):
 async def songs(interaction: discord.Interaction, username: str, instrument: str):
     try:
         data = load_player_data()
-        song_info = load_song_info()
-
-        normalized_song_info = {
-            k.lower(): {song.lower().strip(): v for song, v in v.items()} for k, v in song_info.items()
-        }
+        song_catalog = get_song_catalog()
 
         instrument_data = get_user_instrument_data(username, instrument, data)
         if not instrument_data or "songs" not in instrument_data:
@@ -395,7 +406,7 @@ async def songs(interaction: discord.Interaction, username: str, instrument: str
             weight = 100 * (DECAY_RATE ** (rank - 1))
             scores_list.append(score)  
 
-            song_metadata = get_song_metadata(song_name, instrument, normalized_song_info)
+            song_metadata = get_song_metadata(song_name, instrument, song_catalog)
             perfect, good = calculate_notes(score, song_metadata)
 
             difficulty = song_metadata.get("difficulty", "Unknown") if song_metadata else "Unknown"
@@ -666,6 +677,50 @@ async def remove_tournament_role(interaction: discord.Interaction):
     except Exception as e:
         await interaction.followup.send(f"⚠️ Error removing tournament role: {e}", ephemeral=True)
 
+@bot.tree.command(name="rerank_all", description="Recompute every player's ranks after rank constants change.")
+async def rerank_all(interaction: discord.Interaction):
+    # Role restriction
+    required_role_id = 1334940931861778453
+    if required_role_id not in [role.id for role in interaction.user.roles]:
+        await interaction.response.send_message("⛔ You do not have permission to use this command.", ephemeral=True)
+        return
+
+    await interaction.response.defer()
+
+    try:
+        # No score writes from the snapshot until the new ranks are saved, or they'd be overwritten with stale ones
+        async with write_coordinator.exclusive():
+            data = load_player_data()
+            keys, lengths, scores = collect_scores(data)
+
+            # The NumPy part runs off the event loop, results are applied back on it
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(None, compute_ranks, keys, lengths, scores)
+            changed = apply_ranks(data, keys, *results)
+
+            await write_coordinator.replace_all(data)
+            get_ranking_engine().forget()
+            get_standings().rebuild()
+
+        # Named ranks may have moved, bring everyone's roles in line
+        queued = role_sync_queue.resync_all([interaction.guild])
+
+        await interaction.followup.send(f"✅ Re-ranked {len(data)} players ({changed} instrument ranks changed), {queued} role syncs queued.")
+
+    except Exception as e:
+        await interaction.followup.send(f"⚠️ Error re-ranking players: {e}", ephemeral=True)
+
+@bot.tree.command(name="resync_roles", description="Rebuild every player's rank roles from their stored ranks.")
+async def resync_roles(interaction: discord.Interaction):
+    # Role restriction
+    required_role_id = 1334940931861778453
+    if required_role_id not in [role.id for role in interaction.user.roles]:
+        await interaction.response.send_message("⛔ You do not have permission to use this command.", ephemeral=True)
+        return
+
+    queued = role_sync_queue.resync_all([interaction.guild])
+    await interaction.response.send_message(f"✅ Queued a role sync for {queued} players. Roles will update over the next few minutes.")
+
 # import aiohttp
 # import unicodedata
 # import json 
@@ -801,4 +856,29 @@ async def remove_tournament_role(interaction: discord.Interaction):
     
 #     await interaction.response.send_message(help_message, ephemeral=True)
 
-bot.run(bot_token)
+
+async def stop_background_tasks():
+    """Stops the tasks started in on_ready, then the OCR workers, then flushes and compacts player data.
+
+    Called by main.py once the bot has disconnected. A verification cut off here stays in
+    verification_queue.json and runs again on the next start.
+    """
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+
+    await ocr_service.close()
+    try:
+        await write_coordinator.close()
+    except Exception as e:
+        print(f"Error compacting score journal on shutdown: {e}")
+
+
+async def setup(bot):
+    # Slash commands and listeners are registered on config.bot when this module is imported
+    print(f"Loaded {len(bot.tree.get_commands())} slash commands")
+
+
+if __name__ == "__main__":
+    bot.run(bot_token)
@@ -9,6 +9,9 @@ load_dotenv()
 # Access the bot token
 bot_token = os.getenv("BOT_TOKEN")
 
+# Player/song storage: "json" (player_data.json + song_info.json) or "sqlite"
+storage_backend = os.getenv("STORAGE_BACKEND", "json").lower()
+
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
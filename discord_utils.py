@@ -1,120 +1,101 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ui import Button, View
-from json_utils import update_player_data
-import re
-from constants import RANK_PRIORITY
-
-# Autocomplete function for usernames
-async def username_autocomplete(interaction: discord.Interaction, current: str):
-    return [
-        app_commands.Choice(name=member.name, value=member.name)
-        for member in interaction.guild.members
-        if current.lower() in member.name.lower()
-    ][:25]  # Limit to 25 options per Discord's restrictions
-
-async def song_name_autocomplete(interaction: discord.Interaction, current: str):
-    from json_utils import load_song_info
-    song_info = load_song_info()
-    all_songs = {song for instrument in song_info.values() for song in instrument.keys()}  # Get all unique song names
-    suggestions = [app_commands.Choice(name=song, value=song) for song in all_songs if current.lower() in song.lower()]
-    return suggestions[:25]  # Discord limits autocomplete to 25 choices
-
-async def get_average_rank(member):
-    instrument_keywords = ["Lead", "Vocals", "Bass", "Drums", "Pro Lead", "Pro Bass"]
-
-    instrument_ranks = {}  # Track ranks per instrument
-
-    def clean_role_name(role_name):
-        """Removes emoji prefixes and extra spaces from role names."""
-        return re.sub(r"[\U0001F300-\U0001FAD6]", "", role_name).strip()  # Removes emoji
-
-    for role in member.roles:
-        role_name = clean_role_name(role.name)  # Normalize role name (remove emojis)
-        for rank in RANK_PRIORITY:
-            if rank in role_name:
-                for instrument in instrument_keywords:
-                    if instrument in role_name:
-                        instrument_ranks[instrument] = rank  # Store rank per instrument
-                        break
-
-    if len(instrument_ranks) < 4:
-        return None  # Not enough different instrument ranks
-
-    # Determine the highest common rank across instruments
-    for rank in RANK_PRIORITY:
-        if rank in instrument_ranks.values():
-            return rank
-
-    return None
-
-async def assign_role(member, instrument, named_rank):
-
-    from json_utils import load_player_data
-    # Load player data
-    player_data = load_player_data().get(str(member.id), {})
-    instrument_data = player_data.get(instrument, {})
-
-    if not instrument_data or len(instrument_data["songs"]) < 4:
-        print(f"{member.name} does not have enough scores for {instrument}. Role not assigned.")
+from json_utils import update_player_data, player_store
+from role_sync import role_sync_queue
+from config import bot
+from search_index import NameIndex
+
+# Per-guild member name indexes for username autocomplete, kept current by the member events below
+member_indexes = {}
+
+def get_member_index(guild):
+    index = member_indexes.get(guild.id)
+    if index is None:
+        # Only if autocomplete runs before build_member_index() has finished for the guild
+        index = NameIndex(member.name for member in guild.members)
+        member_indexes[guild.id] = index
+    return index
+
+async def build_member_index(guild):
+    """Builds the guild's member index on a worker thread, so a large guild doesn't stall the event loop."""
+    if guild.id in member_indexes:
         return
-
-    # Define role names for the instrument (with emoji prefixes)
-    role_name = {
-        "lead": f"🎸Lead - {named_rank}",
-        "vocals": f"🎤Vocals - {named_rank}",
-        "bass": f"🎚️Bass - {named_rank}",
-        "drums": f"🥁Drums - {named_rank}",
-        "pro lead": f"🎸Pro Lead - {named_rank}",
-        "pro bass": f"🎚️Pro Bass - {named_rank}",
-    }.get(instrument.lower())
-
-    if not role_name:
+    names = [member.name for member in guild.members]
+    index = await asyncio.get_running_loop().run_in_executor(None, NameIndex, names)
+    if guild.id in member_indexes:  # Built by the lazy path in the meantime
         return
+    # Catch up on joins, leaves and renames that arrived while the index was being built
+    current = {member.name for member in guild.members}
+    for name in set(names) - current:
+        index.remove(name)
+    for name in current - set(names):
+        index.add(name)
+    member_indexes[guild.id] = index
+
+@bot.listen("on_ready")
+async def build_member_indexes():
+    for guild in bot.guilds:
+        await build_member_index(guild)
+
+@bot.listen("on_guild_available")
+async def index_guild_available(guild):
+    await build_member_index(guild)
+
+@bot.listen("on_guild_join")
+async def index_guild_join(guild):
+    await build_member_index(guild)
+
+@bot.listen("on_member_join")
+async def index_member_join(member):
+    if member.guild.id in member_indexes:
+        member_indexes[member.guild.id].add(member.name)
+
+@bot.listen("on_member_remove")
+async def index_member_remove(member):
+    if member.guild.id in member_indexes:
+        member_indexes[member.guild.id].remove(member.name)
+
+@bot.listen("on_member_update")
+async def index_member_update(before, after):
+    if before.name != after.name and after.guild.id in member_indexes:
+        member_indexes[after.guild.id].remove(before.name)
+        member_indexes[after.guild.id].add(after.name)
+
+@bot.listen("on_user_update")
+async def index_user_update(before, after):
+    # Username changes arrive as user updates, once for every guild the user shares with the bot
+    if before.name == after.name:
+        return
+    for guild_id, index in member_indexes.items():
+        if before.name in index:
+            index.remove(before.name)
+            index.add(after.name)
 
-    guild = member.guild
-    role = discord.utils.get(guild.roles, name=role_name)
+@bot.listen("on_guild_remove")
+async def drop_member_index(guild):
+    member_indexes.pop(guild.id, None)
 
-    if not role:
-        print(f"Role '{role_name}' does not exist. Please ensure it is created beforehand.")
-        return
+# Autocomplete function for usernames
+async def username_autocomplete(interaction: discord.Interaction, current: str):
+    # Players with stored scores rank ahead of other members
+    matches = get_member_index(interaction.guild).search(current, limit=25, preferred=player_store.usernames())
+    return [app_commands.Choice(name=name, value=name) for name in matches]  # Limit to 25 options per Discord's restrictions
 
-    # Remove previous roles for the same instrument
-    instrument_prefixes = {
-        "lead": "🎸Lead",
-        "vocals": "🎤Vocals",
-        "bass": "🎚️Bass",
-        "drums": "🥁Drums",
-        "pro lead": "🎸Pro Lead",
-        "pro bass": "🎚️Pro Bass",
-    }
-
-    instrument_prefix = instrument_prefixes.get(instrument.lower())
-
-    if instrument_prefix:
-        for existing_role in member.roles:
-            if existing_role.name.startswith(instrument_prefix):
-                await member.remove_roles(existing_role)
-
-    # Assign the new instrument-specific role
-    await member.add_roles(role)
-
-    # Determine the user's overall rank and assign the role if applicable
-    average_rank = await get_average_rank(member)
-    if average_rank:
-        overall_role_name = f"{average_rank}"
-        overall_role = discord.utils.get(guild.roles, name=overall_role_name)
-
-        if overall_role:
-    # Find and remove only the previous overall rank role
-            for existing_role in member.roles:
-                if existing_role.name in RANK_PRIORITY:  # Check if it's an overall rank role
-                    await member.remove_roles(existing_role)
-                    break  # Stop after removing one
-
-            await member.add_roles(overall_role)
-        else:
-            print(f"Role '{overall_role_name}' does not exist. Please ensure it is created beforehand.")
+async def song_name_autocomplete(interaction: discord.Interaction, current: str):
+    from json_utils import get_song_catalog
+    # Precomputed prefix/trigram index, ranked best match first
+    matches = get_song_catalog().name_index.search(current, limit=25)  # Discord limits autocomplete to 25 choices
+    return [app_commands.Choice(name=song, value=song) for song in matches]
+
+async def assign_role(member, instrument=None, named_rank=None):
+    """Queues a rank role sync for the member.
+
+    The roles are worked out from the stored ranks when the sync runs, so several
+    submissions in a row collapse into a single role edit.
+    """
+    role_sync_queue.enqueue(member)
 
 
 async def pending_scores(embed, guild, player_id, submitter_username, instrument, song_name, perfect, good, missed, striked):
@@ -1,113 +1,555 @@
 from PIL import Image
-from PIL import ImageEnhance, ImageFilter
+from PIL import ImageFilter
+import numpy as np
 import pytesseract
-import requests
+import aiohttp
 from io import BytesIO
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import json
+import hashlib
+from collections import Counter, OrderedDict
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-from langdetect import detect
-from deep_translator import GoogleTranslator
-
-import re
+from ocr_labels import parse_counts, matched_fields, FIELDS, LABEL_WORD_PATTERNS
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"  
 
+SCALE_FACTORS = [0.5, 1.0, 1.5, 2.0, 3.0, 3.5, 4.0, 5.0, 6.0, 7.0, 8.0]
+OCR_LANGUAGES = "eng+spa+fra+deu+jpn"
+# Preprocessing knobs, part of the OCR cache key
+PREPROCESS_PARAMS = {
+    "contrast": 4,
+    "threshold": 150,
+    "median_size": 3,
+    "sharpen": True,
+}
+# ITU-R 601-2 luma in 16-bit fixed point, the same weights and rounding Image.convert("L") uses
+LUMA_WEIGHTS = np.array([19595, 38470, 7471], dtype=np.int32)
+# Per-scale tries/hits, used to try the historically best scales first
+OCR_SCALE_STATS_FILE = "ocr_scale_stats.json"
+
+# Results panel location, found once per screenshot resolution
+ROI_PROBE_WIDTH = 1280
+ROI_MARGIN = 0.6  # Padding around each row, as a share of the label's height
+ROI_LABELS = LABEL_WORD_PATTERNS
+
+# Proof screenshot downloads, see ImageDownloader
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40_000_000
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=30, sock_connect=10, sock_read=10)
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+# JPEGs bigger than this are downscaled while decoding (PIL draft mode)
+MAX_DECODE_DIMENSION = 2560
+
+# Shared OCR workers, see OcrService
+OCR_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+OCR_MAX_CONCURRENT_JOBS = 2
+OCR_MAX_QUEUED_JOBS = 20
+OCR_JOB_TIMEOUT_SECONDS = 120
+
+# Extracted counts per screenshot, so re-uploads and re-verifications skip Tesseract
+OCR_CACHE_FILE = "ocr_cache.json"
+OCR_CACHE_MAX_ENTRIES = 2000
+
+_roi_cache = {}  # (width, height) -> rows from locate_stats_rows (None: panel not found)
+
+# The OCR cache and scale stats files are written here, one write at a time, never on the event loop
+_ocr_file_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-file-writer")
+
+
+
+def preprocess_image(image, params=PREPROCESS_PARAMS):
+    """Binarizes a screenshot (or crop) at its native resolution.
 
+    Grayscale, contrast and threshold are fused into one NumPy comparison:
+    mean + contrast * (gray - mean) > threshold, with mean the average gray level
+    like ImageEnhance.Contrast uses. The filters then run once here, before any scaling.
+    """
+    if image.mode == "L":
+        gray = np.asarray(image, dtype=np.int32)
+    else:
+        rgb = np.asarray(image.convert("RGB"), dtype=np.int32)
+        gray = (rgb @ LUMA_WEIGHTS + 0x8000) >> 16
+    mean = int(gray.mean() + 0.5)
+    contrast = params["contrast"]
+    # The enhanced pixel is rounded before it's compared, hence the + 0.5
+    binary = gray * contrast >= params["threshold"] + 0.5 + mean * (contrast - 1)
+    filtered_image = Image.fromarray(np.where(binary, 255, 0).astype(np.uint8))
 
-def preprocess_image(image, scale_factor=1.0):
-    # Resize the image to enhance OCR accuracy
+    if params["median_size"]:
+        filtered_image = filtered_image.filter(ImageFilter.MedianFilter(size=params["median_size"]))  # Optional noise removal
+    if params["sharpen"]:
+        filtered_image = filtered_image.filter(ImageFilter.SHARPEN)
+    return filtered_image
+
+def scale_image(image, scale_factor):
+    """Resizes a preprocessed image for one OCR pass, as an uncompressed PNM for Tesseract."""
     if scale_factor != 1.0:
         new_size = (int(image.width * scale_factor), int(image.height * scale_factor))
         image = image.resize(new_size, Image.LANCZOS)  # High-quality scaling
+    else:
+        image = image.copy()
+    # pytesseract writes the image out in its format; PPM is a raw buffer dump, PNG would be deflated every pass
+    image.format = "PPM"
+    return image
 
-    # Convert to grayscale
-    gray_image = image.convert("L")
-    
-    # Increase contrast further for bold text
-    enhancer = ImageEnhance.Contrast(gray_image)
-    enhanced_image = enhancer.enhance(4)  # Increased contrast
-    
-    # Apply thresholding
-    threshold_image = enhanced_image.point(lambda p: p > 150 and 255)  
-    filtered_image = threshold_image.filter(ImageFilter.MedianFilter(size=3))  # Optional noise removal
-
-    # Sharpen the image
-    sharpened_image = filtered_image.filter(ImageFilter.SHARPEN)  
-    
-    return sharpened_image
-
-def clean_number(match, context=None):
-    if match:
-        number_str = match.group(1)
-        
-        if number_str:
-            number_str = number_str.replace('O', '0').replace(',', '')  
-
-            if 'T1' in number_str:
-                return 71  
-
-            if context == "missed_notes":
-                number_str = re.sub(r'[^\d]', '', number_str)
-                if '101' in number_str:
-                    return 1
+def locate_stats_rows(image_bytes):
+    """Finds the Perfect/Good/Missed/Strikes rows of the results panel.
 
-            try:
-                return int(number_str)
-            except ValueError:
-                return 0
-    return 0
+    OCRs a small grayscale copy once in sparse-text mode, looks for the row labels and
+    widens each label's box to every word on the same line (the count sits to its right).
+    Returns {field: (left, top, right, bottom)} as fractions of the image size, or None if
+    fewer than two labels were found. Executed in a worker process.
+    """
+    image = open_image(image_bytes).convert("L")
+    probe_scale = min(1.0, ROI_PROBE_WIDTH / image.width)
+    if probe_scale < 1.0:
+        image = image.resize((int(image.width * probe_scale), int(image.height * probe_scale)), Image.BILINEAR)
+    image.format = "PPM"
+
+    words = pytesseract.image_to_data(
+        image, config=f"--oem 3 --psm 11 -l {OCR_LANGUAGES}", output_type=pytesseract.Output.DICT
+    )
+    boxes = [
+        (words["text"][i], words["left"][i], words["top"][i], words["width"][i], words["height"][i])
+        for i in range(len(words["text"]))
+        if words["text"][i].strip()
+    ]
+
+    rows = {}
+    for text, left, top, width, height in boxes:
+        field = next((field for field, pattern in ROI_LABELS.items() if pattern.search(text)), None)
+        if field is None or field in rows:
+            continue
+        center = top + height / 2
+        same_line = [box for box in boxes if abs(box[2] + box[4] / 2 - center) <= height * 0.75]
+        right = max(box[1] + box[3] for box in same_line)
+        margin = height * ROI_MARGIN
+        rows[field] = (
+            max(0.0, (left - margin) / image.width),
+            max(0.0, (top - margin) / image.height),
+            min(1.0, (right + margin) / image.width),
+            min(1.0, (top + height + margin) / image.height),
+        )
+
+    return rows if len(rows) >= 2 else None
+
+def crop_rows(image, rows):
+    return [
+        image.crop((int(l * image.width), int(t * image.height), int(r * image.width), int(b * image.height)))
+        for l, t, r, b in rows.values()
+    ]
+
+def prepare_images(image_bytes, rows=None, params=PREPROCESS_PARAMS):
+    """Decodes and preprocesses a screenshot once for every scale. Executed in a worker process.
+
+    With rows (from locate_stats_rows) returns one image per row crop, otherwise the
+    whole screenshot as a single image.
+    """
+    image = open_image(image_bytes)
+    if rows:
+        return [preprocess_image(crop, params) for crop in crop_rows(image, rows)]
+    return [preprocess_image(image, params)]
+
+def ocr_at_scale(images, scale, line_crops=False):
+    """Runs one scale of the OCR pipeline on prepare_images() output and returns (counts, text).
+    Executed in a worker process.
+
+    Row crops are OCR'd one line each; otherwise the image is read as a block of text.
+    """
+    if line_crops:
+        custom_config = f'--oem 3 --psm 7 -l {OCR_LANGUAGES}'
+        text = "\n".join(
+            pytesseract.image_to_string(scale_image(image, scale), config=custom_config).strip()
+            for image in images
+        )
+    else:
+        custom_config = f'--oem 3 --psm 6 -l {OCR_LANGUAGES}'
+        text = pytesseract.image_to_string(scale_image(images[0], scale), config=custom_config)
 
-def extract_data_from_image(image_url, perfect, good, missed, striked):
+    # Labels are matched in every supported language directly, no translation step
+    return parse_counts(text), text
+
+def load_scale_stats():
     try:
-        response = requests.get(image_url)
-        image = Image.open(BytesIO(response.content))
-
-        scale_factors = [0.5, 1.0, 1.5, 2.0, 3.0, 3.5, 4.0, 5.0, 6.0, 7.0, 8.0]
-        languages = "eng+spa+fra+deu+jpn"  
-
-        for scale in scale_factors:
-            print(f"Trying scale factor: {scale} with multiple languages: {languages}")
-            
-            preprocessed_image = preprocess_image(image, scale)
-            custom_config = f'--oem 3 --psm 6 -l {languages}'
-            text = pytesseract.image_to_string(preprocessed_image, config=custom_config)
-
-            print("OCR Output:")
-            print(text)
-
-            detected_lang = detect(text)
-            print(f"Detected language: {detected_lang}")
-
-            if detected_lang != "en":
-                print("Translating OCR text to English...")
-                text = GoogleTranslator(source='auto', target='en').translate(text)
-                print("Translated text:")
-                print(text)
-
-            # Allow extraction even if "notes" is missing
-            perfect_notes_match = re.search(r'(?:Perfect|erfect|Perfectas)\s*(?:notes|Notas|note:)?\s*([\d,]+)', text, re.IGNORECASE)
-            good_notes_match = re.search(r'(?:Good|Notas buenas)\s*(?:notes|note:)?\s*([\d,]+)', text, re.IGNORECASE)
-            missed_notes_match = re.search(r'(?:Missed|Notas falladas)\s*(?:notes|note:)?\s*([\d,]+)', text, re.IGNORECASE)
-            striked_notes_match = re.search(r'(?:Strikes|Golpes)\s*(?:notes|note:)?\s*([\d,]+)', text, re.IGNORECASE)
-            
-            # Clean and extract numbers
-            perfect_notes = clean_number(perfect_notes_match)
-            good_notes = clean_number(good_notes_match)
-            missed_notes = clean_number(missed_notes_match, context="missed_notes")
-            striked_notes = clean_number(striked_notes_match)
-
-            if (perfect_notes, good_notes, missed_notes, striked_notes) == (perfect, good, missed, striked):
-                print(f"Match found at scale {scale}!")
-                return perfect_notes, good_notes, missed_notes, striked_notes
-
-        return perfect_notes, good_notes, missed_notes, striked_notes
-
-    except Exception as e:
-        print(f"Error: {e}")
+        with open(OCR_SCALE_STATS_FILE, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_scale_stats(stats):
+    temp_path = f"{OCR_SCALE_STATS_FILE}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(stats, file, indent=4)
+    os.replace(temp_path, OCR_SCALE_STATS_FILE)
+
+def ordered_scales(stats):
+    """Scale factors ordered by how often each has produced the matching result before."""
+    def hit_rate(scale):
+        entry = stats.get(str(scale), {})
+        # Laplace smoothing so untried scales aren't written off
+        return (entry.get("hits", 0) + 1) / (entry.get("tries", 0) + 2)
+    return sorted(SCALE_FACTORS, key=hit_rate, reverse=True)
+
+def record_scale_results(stats, tried_scales, winning_scale):
+    # A scale is in tried_scales once per pass it ran in, but can only win once
+    for scale in tried_scales:
+        stats.setdefault(str(scale), {"tries": 0, "hits": 0})["tries"] += 1
+    if winning_scale is not None:
+        stats[str(winning_scale)]["hits"] += 1
+
+class CoalescingWriter:
+    """Writes a file on the OCR file writer thread whenever schedule() is called, off the event loop.
+
+    snapshot() runs on the loop and returns what write() needs; write() runs on the thread.
+    Calls made while a write is in flight collapse into one more write after it.
+    """
+
+    def __init__(self, snapshot, write):
+        self.snapshot = snapshot
+        self.write = write
+        self._task = None
+        self._dirty = False
+
+    def schedule(self):
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._dirty:
+            self._dirty = False
+            try:
+                await loop.run_in_executor(_ocr_file_writer, self.write, self.snapshot())
+            except Exception as e:
+                print(f"Error writing OCR state: {e}")
+
+    async def flush(self):
+        if self._task is not None:
+            await self._task
+
+def image_resolution(image_bytes):
+    with Image.open(BytesIO(image_bytes)) as image:
+        return image.size
+
+def open_image(image_bytes):
+    """Opens a screenshot without decoding more pixels than OCR needs.
+
+    Image.open only reads the header; JPEGs larger than MAX_DECODE_DIMENSION are put in
+    draft mode so libjpeg decodes them straight at 1/2, 1/4 or 1/8 size.
+    """
+    image = Image.open(BytesIO(image_bytes))
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        raise ValueError(f"Image is too large to process ({image.width}x{image.height})")
+    if image.format == "JPEG" and max(image.size) > MAX_DECODE_DIMENSION:
+        ratio = MAX_DECODE_DIMENSION / max(image.size)
+        image.draft("RGB", (int(image.width * ratio), int(image.height * ratio)))
+    return image
+
+class ImageTooLargeError(Exception):
+    """Raised when a proof image goes over MAX_IMAGE_BYTES."""
+
+class ImageDownloader:
+    """Streams proof screenshots over one pooled aiohttp session.
+
+    Bodies are read in chunks into a buffer capped at max_bytes, so an oversized
+    upload is rejected as soon as it crosses the limit instead of being held in memory.
+    """
+
+    def __init__(self, max_bytes=MAX_IMAGE_BYTES, timeout=DOWNLOAD_TIMEOUT):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=aiohttp.TCPConnector(limit=8, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def fetch(self, image_url):
+        async with self._get_session().get(image_url) as response:
+            response.raise_for_status()
+            if response.content_length and response.content_length > self.max_bytes:
+                raise ImageTooLargeError(f"Image is {response.content_length} bytes, the limit is {self.max_bytes}")
+
+            buffer = bytearray()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+                if len(buffer) + len(chunk) > self.max_bytes:
+                    raise ImageTooLargeError(f"Image is over the {self.max_bytes} byte limit")
+                buffer.extend(chunk)
+            return bytes(buffer)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+def usable_reading(counts, text):
+    """Whether OCR found the stats panel at all: every field's label read, and not everything zero."""
+    return any(counts) and len(matched_fields(text)) == len(FIELDS)
+
+def settle_results(results, winning_scale, expected):
+    """Picks the final reading once the scales are done (or one of them matched)."""
+    if winning_scale is not None:
+        return results[winning_scale]
+
+    # No exact match, return the reading most scales agreed on
+    readings = [result for result in results.values() if any(result)]
+    if not readings:
         return 0, 0, 0, 0
+    return Counter(readings).most_common(1)[0][0]
+
+def ocr_cache_key(image_bytes, params=PREPROCESS_PARAMS):
+    """SHA-256 of the image bytes plus everything that changes what OCR reads from them."""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(json.dumps(
+        {"params": params, "scales": SCALE_FACTORS, "languages": OCR_LANGUAGES}, sort_keys=True
+    ).encode())
+    return digest.hexdigest()
+
+class OcrCache:
+    """Size-bounded LRU of OCR results, persisted to a JSON file.
+
+    Each entry keeps the per-scale readings, the winning scale and its raw text (only
+    when a scale matched), and whether every scale was tried. A cached run answers a
+    new claim if one of its readings matches it, or if every scale was tried. The file
+    is rewritten through a CoalescingWriter, so store() never blocks the event loop.
+    """
+
+    def __init__(self, path, max_entries=OCR_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = None
+        # Entries are replaced, never changed in place, so a shallow copy is a consistent snapshot
+        self._writer = CoalescingWriter(lambda: list(self._entries.items()), self._save)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as file:
+                return OrderedDict(json.load(file))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return OrderedDict()
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    async def load(self):
+        """Reads the cache file on a worker thread, so the first lookup doesn't parse it on the event loop."""
+        if self._entries is None:
+            entries = await asyncio.get_running_loop().run_in_executor(None, self._read)
+            if self._entries is None:
+                self._entries = entries
+
+    def _save(self, entries):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(dict(entries), file)
+        os.replace(temp_path, self.path)
+
+    def lookup(self, key, expected):
+        """Returns the cached counts for this claim, or None if OCR has to run."""
+        entries = self._load()
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        entries.move_to_end(key)
+
+        readings = {float(scale): tuple(counts) for scale, counts in entry["readings"].items()}
+        if expected in readings.values():
+            return expected
+        if entry["complete"]:
+            return settle_results(readings, None, expected)
+        return None
+
+    def store(self, key, readings, winning_scale, text, complete):
+        entries = self._load()
+        entry = {
+            "readings": {str(scale): list(counts) for scale, counts in readings.items()},
+            "winning_scale": winning_scale,
+            "complete": complete,
+        }
+        if winning_scale is not None:
+            entry["text"] = text
+        entries[key] = entry
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        self._writer.schedule()
+
+    async def flush(self):
+        """Waits for any scheduled write of the cache file."""
+        await self._writer.flush()
+
+ocr_cache = OcrCache(OCR_CACHE_FILE)
+
+def _init_ocr_worker():
+    # Runs once per worker process: load the image plugins up front so the first job doesn't pay for it
+    Image.init()
+
+class OcrBusyError(Exception):
+    """Raised when the OCR queue is already full."""
+
+class OcrService:
+    """Bot-lifetime OCR workers shared by every verification.
+
+    - a fixed process pool, spawned and warmed up once, does the PIL + Tesseract work
+      outside the GIL; its size also caps how many tesseract processes run at once
+    - at most max_jobs screenshots are processed at the same time, up to max_queued
+      more wait for a slot, and anything beyond that is turned away with OcrBusyError
+    - each job has a deadline; on timeout its outstanding scales are cancelled
+    - results are looked up in / stored to the OcrCache first, by image hash
+    """
+
+    def __init__(self, workers=OCR_WORKERS, max_jobs=OCR_MAX_CONCURRENT_JOBS,
+                 max_queued=OCR_MAX_QUEUED_JOBS, timeout=OCR_JOB_TIMEOUT_SECONDS,
+                 params=PREPROCESS_PARAMS, cache=ocr_cache):
+        self.params = params
+        self.cache = cache
+        self.downloader = ImageDownloader()
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.pool = None
+        self._slots = None
+        self._jobs = 0  # running + waiting
+        self._scale_stats = None  # Loaded from OCR_SCALE_STATS_FILE on the first job, then kept in memory
+        self._stats_writer = CoalescingWriter(
+            lambda: {scale: dict(entry) for scale, entry in self._scale_stats.items()}, save_scale_stats
+        )
+
+    def start(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_ocr_worker)
+            # Spawn every worker now rather than on the first burst of submissions
+            for _ in range(self.workers):
+                self.pool.submit(_init_ocr_worker)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def close(self):
+        await self.downloader.close()
+        self.shutdown()
+        await self._stats_writer.flush()
+        if self.cache is not None:
+            await self.cache.flush()
+
+    async def _load_scale_stats(self):
+        if self._scale_stats is None:
+            stats = await asyncio.get_running_loop().run_in_executor(None, load_scale_stats)
+            if self._scale_stats is None:  # Another job may have loaded them meanwhile
+                self._scale_stats = stats
+        return self._scale_stats
+
+    async def extract(self, image_url, expected):
+        self.start()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_jobs)
+        if self._jobs >= self.max_jobs + self.max_queued:
+            raise OcrBusyError(f"{self._jobs} OCR jobs already queued")
+
+        self._jobs += 1
+        try:
+            async with self._slots:
+                return await asyncio.wait_for(self._run(image_url, tuple(expected)), self.timeout)
+        finally:
+            self._jobs -= 1
+
+    async def _stats_rows(self, image_bytes):
+        """Returns the cached results-panel rows for this screenshot's resolution, locating them if needed."""
+        resolution = image_resolution(image_bytes)
+        if resolution not in _roi_cache:
+            loop = asyncio.get_running_loop()
+            rows = await loop.run_in_executor(self.pool, locate_stats_rows, image_bytes)
+            if rows is None:
+                print(f"Results panel not found for {resolution[0]}x{resolution[1]}, using the full screenshot")
+            _roi_cache[resolution] = rows
+        return _roi_cache[resolution]
+
+    async def _run_scales(self, image_bytes, rows, scales, expected):
+        """OCRs every scale across the pool, best historical scales first, stopping at the first match.
+
+        Returns (results, texts, winning_scale). rows are the stats panel line crops, or None for the full image.
+        """
+        loop = asyncio.get_running_loop()
+        images = await loop.run_in_executor(self.pool, prepare_images, image_bytes, rows, self.params)
+        futures = {
+            loop.run_in_executor(self.pool, ocr_at_scale, images, scale, bool(rows)): scale
+            for scale in scales
+        }
+        results = {}
+        texts = {}
+        winning_scale = None
+        try:
+            pending = set(futures)
+            while pending and winning_scale is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    scale = futures[future]
+                    try:
+                        results[scale], texts[scale] = future.result()
+                    except Exception as e:
+                        print(f"OCR failed at scale {scale}: {e}")
+                        continue
+                    print(f"Scale {scale} read {results[scale]}")
+
+                    if results[scale] == expected:
+                        print(f"Match found at scale {scale}!")
+                        winning_scale = scale
+                        break
+        finally:
+            # Drop the scales that haven't started yet (also runs on timeout)
+            for future in futures:
+                future.cancel()
+        return results, texts, winning_scale
+
+    async def _run(self, image_url, expected):
+        loop = asyncio.get_running_loop()
+        image_bytes = await self.downloader.fetch(image_url)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = await loop.run_in_executor(None, ocr_cache_key, image_bytes, self.params)
+            await self.cache.load()
+            cached = self.cache.lookup(cache_key, expected)
+            if cached is not None:
+                print(f"OCR cache hit: {cached}")
+                return cached
+
+        stats = await self._load_scale_stats()
+        scales = ordered_scales(stats)
+        print(f"Trying scale factors in order: {scales}")
+
+        rows = await self._stats_rows(image_bytes)
+        results, texts, winning_scale = await self._run_scales(image_bytes, rows, scales, expected)
+        tried = list(results)
+        complete = len(results) == len(scales)
+        # A clean reading that doesn't match is usually a wrong claim, the crops are only at fault if they read nothing
+        if rows and winning_scale is None and not any(usable_reading(results[s], texts[s]) for s in results):
+            # The cached panel rows missed the stats panel in this screenshot: forget them, read the full image instead
+            _roi_cache.pop(image_resolution(image_bytes), None)
+            print("No usable reading from the stats panel crops, retrying on the full image")
+            full_results, full_texts, winning_scale = await self._run_scales(image_bytes, None, scales, expected)
+            tried += list(full_results)
+            complete = len(full_results) == len(scales)
+            # Both passes are kept; at a scale read in both, the full image's reading replaces the unusable crop one
+            results = {**results, **full_results}
+            texts = {**texts, **full_texts}
+
+        record_scale_results(stats, tried, winning_scale)
+        self._stats_writer.schedule()
+        if cache_key is not None and results:
+            self.cache.store(cache_key, results, winning_scale, texts.get(winning_scale), complete=complete)
+        return settle_results(results, winning_scale, expected)
 
-async def extract_data_async(image_url, perfect, good, missed, striked):
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as pool:
-        return await loop.run_in_executor(pool, extract_data_from_image, image_url, perfect, good, missed, striked)
+ocr_service = OcrService()
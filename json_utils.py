@@ -1,11 +1,17 @@
 import os
+import time
+import asyncio
 import discord
 import json
-from constants import INSTRUMENT_THRESHOLDS
 
-from ranking_utils import determine_rank, calculate_final_rank, calculate_named_rank
+from ranking_utils import determine_rank, RankingEngine
+from song_catalog import SongCatalog
+from score_journal import ScoreJournal, apply_entry
+from leaderboards import Leaderboards
+from standings import Standings
+from write_coordinator import WriteCoordinator
 
-from config import bot
+from config import bot, storage_backend
 
 # {
 #     "{PLAYER ID}": { 
@@ -17,18 +23,156 @@ from config import bot
 # }
 
 PLAYER_DATA_FILE = "player_data.json"
+SCORE_JOURNAL_FILE = "player_data.journal"
 SONG_INFO_DATA_FILE = "song_info.json"
+SQLITE_DATA_FILE = "rank_bot.db"
+
+# Fold the score journal into player_data.json after this many entries or seconds, whichever comes first
+COMPACT_EVERY_ENTRIES = 200
+COMPACT_INTERVAL_SECONDS = 300
+
+class PlayerStore:
+    """Process-wide, in-memory copy of the player data.
+
+    player_data.json is a snapshot and score writes are appended to an fsync'd
+    journal (score_journal.py), so saving a score costs one line instead of a full
+    rewrite. The journal is folded into a new snapshot every COMPACT_EVERY_ENTRIES
+    entries or COMPACT_INTERVAL_SECONDS, and loading replays snapshot + journal.
+
+    Reads are served from memory; the snapshot is only re-read when its mtime
+    changes underneath us (e.g. someone edits it by hand).
+    """
+
+    def __init__(self, path, journal_path):
+        self.path = path
+        self.journal = ScoreJournal(journal_path)
+        self._data = None
+        self._mtime = None
+        self._usernames = None
+        self._last_compaction = time.monotonic()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read(self):
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                with open(self.path, "r") as file:
+                    data = json.load(file)
+            else:
+                data = {}
+        except json.JSONDecodeError as e:
+            if self._data is not None:
+                # Keep serving what we have rather than dropping everyone's scores
+                print(f"Error reading {self.path}, keeping in-memory player data: {e}")
+                return self._data
+            raise RuntimeError(f"{self.path} is not valid JSON, refusing to start from empty player data: {e}")
+
+        for entry in self.journal.replay():
+            apply_entry(data, entry)
+        return data
+
+    def load(self):
+        """Returns the live player data dict, reloading only if the snapshot changed on disk."""
+        mtime = self._file_mtime()
+        if self._data is None or mtime != self._mtime:
+            self._data = self._read()
+            self._mtime = mtime
+            self._usernames = None
+        return self._data
+
+    def usernames(self):
+        """Returns the set of usernames that have player data (cached until the next write)."""
+        data = self.load()
+        if self._usernames is None:
+            self._usernames = {player.get("username") for player in data.values()}
+        return self._usernames
+
+    def apply_score(self, player_id, username, instrument, song_name, score, **fields):
+        """Sets one song score (plus any instrument-level fields) in memory. Returns the journal entry."""
+        entry = {
+            "player_id": player_id,
+            "username": username,
+            "instrument": instrument,
+            "song": song_name,
+            "score": score,
+            "fields": fields,
+        }
+        data = self.load()
+        if player_id not in data:
+            self._usernames = None
+        apply_entry(data, entry)
+        return entry
+
+    def persist(self, entries):
+        """Journals already applied entries with a single fsync. Runs on the WriteCoordinator thread."""
+        self.journal.append_many(entries)
+
+    def checkpoint_due(self):
+        due = time.monotonic() - self._last_compaction >= COMPACT_INTERVAL_SECONDS
+        return self.journal.entries >= COMPACT_EVERY_ENTRIES or bool(due and self.journal.entries)
+
+    # A compaction is split in three so the slow part can run off the event loop:
+    # begin (serialize, on the loop), write (write + fsync the temp file, any thread),
+    # end (swap it in and empty the journal, on the loop again).
+
+    def begin_checkpoint(self):
+        return json.dumps(self.load(), indent=4)
+
+    def write_checkpoint(self, snapshot):
+        with open(f"{self.path}.tmp", "w") as file:
+            file.write(snapshot)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def end_checkpoint(self):
+        os.replace(f"{self.path}.tmp", self.path)
+        self.journal.truncate()
+        self._mtime = self._file_mtime()
+        self._last_compaction = time.monotonic()
+
+    def compact(self):
+        """Writes a fresh snapshot atomically, then empties the journal."""
+        self.write_checkpoint(self.begin_checkpoint())
+        self.end_checkpoint()
+
+    def save(self, data=None):
+        """Replaces the whole data set (e.g. after a bulk edit) and snapshots it."""
+        if data is not None:
+            self._data = data
+        elif self._data is None:
+            self._data = {}
+        self._usernames = None
+        self.compact()
+
+if storage_backend == "sqlite":
+    from sqlite_store import SqliteStore
+    sqlite_store = SqliteStore(SQLITE_DATA_FILE)
+    player_store = sqlite_store
+else:
+    sqlite_store = None
+    player_store = PlayerStore(PLAYER_DATA_FILE, SCORE_JOURNAL_FILE)
+
+write_coordinator = WriteCoordinator(player_store)
+
+async def run_compactor():
+    """Background task that folds the score journal into the snapshot every COMPACT_INTERVAL_SECONDS."""
+    while True:
+        await asyncio.sleep(COMPACT_INTERVAL_SECONDS)
+        try:
+            await write_coordinator.maybe_checkpoint()
+        except Exception as e:
+            print(f"Error compacting score journal: {e}")
+
 def load_player_data():
-    try:
-        if os.path.exists(PLAYER_DATA_FILE) and os.path.getsize(PLAYER_DATA_FILE) > 0:
-            with open(PLAYER_DATA_FILE, "r") as file:
-                return json.load(file)
-        else:
-            return {}
-    except json.JSONDecodeError:
-        return {}
+    return player_store.load()
 
 def load_song_info():
+    if sqlite_store is not None:
+        return sqlite_store.load_song_info()
     try:
         if os.path.exists(SONG_INFO_DATA_FILE) and os.path.getsize(SONG_INFO_DATA_FILE) > 0:
             with open(SONG_INFO_DATA_FILE, "r") as file:
@@ -39,100 +183,111 @@ def load_song_info():
         return {}
     
 def save_song_info(song_info):
-    with open(SONG_INFO_DATA_FILE, "w", encoding="utf-8") as file:
-        json.dump(song_info, file, indent=4)
+    if sqlite_store is not None:
+        sqlite_store.save_song_info(song_info)
+    else:
+        with open(SONG_INFO_DATA_FILE, "w", encoding="utf-8") as file:
+            json.dump(song_info, file, indent=4)
+
+    # Keep the catalog in step with what was just written
+    if _song_catalog is not None:
+        _song_catalog.update(song_info)
+
+_song_catalog = None
+
+def get_song_catalog():
+    """Returns the process-wide SongCatalog, building it from song_info.json on first use."""
+    global _song_catalog
+    if _song_catalog is None:
+        _song_catalog = SongCatalog(load_song_info())
+    return _song_catalog
+
+_leaderboards = None
+
+def get_leaderboards():
+    """Returns the materialized leaderboards, rebuilding them only if the player data was reloaded."""
+    global _leaderboards
+    data = load_player_data()
+    if _leaderboards is None or _leaderboards.data is not data:
+        _leaderboards = Leaderboards(data, get_song_catalog())
+    return _leaderboards
+
+_standings = None
+
+def get_standings():
+    """Returns the per-instrument rank boards, rebuilding them only if the player data was reloaded."""
+    global _standings
+    data = load_player_data()
+    if _standings is None or _standings.data is not data:
+        _standings = Standings(data)
+    return _standings
+
+_ranking_engine = None
+_ranking_source = None
+
+def get_ranking_engine():
+    """Returns the incremental ranking engine, starting a fresh one if the player data was reloaded."""
+    global _ranking_engine, _ranking_source
+    data = load_player_data()
+    if _ranking_engine is None or _ranking_source is not data:
+        _ranking_engine = RankingEngine()
+        _ranking_source = data
+    return _ranking_engine
+
+async def record_score(player_id, username, instrument, song_name, score, **fields):
+    """Applies a song score, keeps the materialized views in step with it, and waits until it's on disk."""
+    leaderboards = get_leaderboards()
+    standings = get_standings()
+    if not fields:
+        # Written without rank fields (pending-score review), keep the engine's cache honest
+        get_ranking_engine().forget(player_id)
+    entry = player_store.apply_score(player_id, username, instrument, song_name, score, **fields)
+    leaderboards.score_changed(player_id, instrument, song_name, score)
+    standings.update(player_id, instrument)
+    await write_coordinator.commit(entry)
 
 async def save_data(player_id, username, instrument, song_name, score):
     from discord_utils import assign_role
     try:
-        # Load existing data
-        data = load_player_data()
+        # One submission per player at a time, so the ranks are computed from the scores being replaced
+        async with write_coordinator.player_lock(player_id):
+            # Load existing data
+            data = load_player_data()
 
-        # Initialize player data if not present
-        if player_id not in data:
-            data[player_id] = {
-                "username": username,
-                instrument: {
-                    "songs": {},
-                    "final_rank_score": 0,
-                    "rank": "Bronze",
-                    "named_rank": "Bronze"
-                }
-            }
-
-        # Initialize instrument data if missing
-        if instrument not in data[player_id]:
-            data[player_id][instrument] = {
-                "songs": {},
-                "final_rank_score": 0,
-                "rank": "Bronze",
-                "named_rank": "Bronze"
-            }
-
-        # Update the best score for the song
-        instrument_data = data[player_id][instrument]
-        best_scores = instrument_data["songs"]
-        # Load song info to get correct capitalization
-        song_info = load_song_info()
-
-        # Find the correct capitalization from the JSON
-        correct_song_name = next(
-            (key for instrument_songs in song_info.values() for key in instrument_songs if key.lower() == song_name.lower()), 
-            song_name
-        )
-        current_score = best_scores.get(correct_song_name, 0)
-        if score > current_score:
-            best_scores[correct_song_name] = score
-
-
-        # Update final rank score and rank for the submitted instrument
-        scores = list(best_scores.values())
-        instrument_data["final_rank_score"] = calculate_final_rank(scores)
-        instrument_data["rank"] = determine_rank(instrument_data["final_rank_score"], instrument)
-
-        # Cycle through all instruments to update named rank
-        for instr in INSTRUMENT_THRESHOLDS.keys():
-            if instr in data[player_id]:
-                scores = list(data[player_id][instr]["songs"].values())
-                data[player_id][instr]["named_rank"] = calculate_named_rank(scores, instr)
+            instrument_data = data.get(player_id, {}).get(instrument, {})
+            best_scores = instrument_data.get("songs", {})
+
+            # Find the correct capitalization from the song catalog
+            correct_song_name = get_song_catalog().canonical_name(song_name, song_name)
+
+            # Keep the best score for the song
+            best_score = max(score, best_scores.get(correct_song_name, 0))
+
+            # Final rank score, rank and named rank for the submitted instrument only
+            final_rank_score, named_rank = get_ranking_engine().submit(
+                player_id, instrument, best_scores, correct_song_name, best_score
+            )
+
+            # Journal the write
+            await record_score(
+                player_id, username, instrument, correct_song_name, best_score,
+                final_rank_score=final_rank_score,
+                rank=determine_rank(final_rank_score, instrument),
+                named_rank=named_rank,
+            )
 
         # Role assignment logic
         guild = discord.utils.find(lambda g: g.get_member(int(player_id)), bot.guilds)
         if guild:
             member = guild.get_member(int(player_id))
             if member:
-                await assign_role(member, instrument, instrument_data["named_rank"])
-
-        # Save updated data
-        with open(PLAYER_DATA_FILE, "w") as file:
-            json.dump(data, file, indent=4)
+                await assign_role(member, instrument, named_rank)
 
     except Exception as e:
         print(f"Error saving data: {e}")
 
 async def update_player_data(player_id, song_name, instrument, score, accept=True):
     """Updates the player data JSON file with the new score if accepted, otherwise does nothing."""
-    # Ensure the file exists
-    if not os.path.exists(PLAYER_DATA_FILE):
-        with open(PLAYER_DATA_FILE, "w") as f:
-            json.dump({}, f, indent=4)
-
-    # Load existing data
-    with open(PLAYER_DATA_FILE, "r") as f:
-        player_data = json.load(f)
-
     if accept:
-        # Ensure player data exists
-        if player_id not in player_data:
-            player_data[player_id] = {"username": "Unknown", instrument: {"songs": {}}}
-
-        # Ensure instrument exists
-        if instrument not in player_data[player_id]:
-            player_data[player_id][instrument] = {"songs": {}}
-
-        # Update score for the song
-        player_data[player_id][instrument]["songs"][song_name] = score
-
-        # Save changes
-        with open(PLAYER_DATA_FILE, "w") as f:
-            json.dump(player_data, f, indent=4)
+        async with write_coordinator.player_lock(player_id):
+            await record_score(player_id, "Unknown", instrument, song_name, score)
@@ -0,0 +1,156 @@
+from bisect import bisect_left, insort
+
+from ranking_utils import get_song_metadata, calculate_notes
+
+
+class SortedBoard:
+    """Player scores kept sorted best-first.
+
+    Keys are (-score, player_id) in a plain sorted list, so finding a position is a
+    bisect and an update is a remove + insort; slicing a page or asking for a
+    player's position never sorts anything.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._scores = {}  # player_id -> score currently on the board
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, player_id):
+        return player_id in self._scores
+
+    def score(self, player_id):
+        return self._scores.get(player_id)
+
+    def update(self, player_id, score):
+        old_score = self._scores.get(player_id)
+        if old_score == score:
+            return
+        if old_score is not None:
+            self._discard((-old_score, player_id))
+        self._scores[player_id] = score
+        insort(self._keys, (-score, player_id))
+
+    def remove(self, player_id):
+        old_score = self._scores.pop(player_id, None)
+        if old_score is not None:
+            self._discard((-old_score, player_id))
+
+    def _discard(self, key):
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def position(self, player_id):
+        """0-based position of a player on the board, or None."""
+        score = self._scores.get(player_id)
+        if score is None:
+            return None
+        return bisect_left(self._keys, (-score, player_id))
+
+    def page(self, start, end):
+        """Returns [(player_id, score)] for positions start..end-1."""
+        return [(player_id, -neg_score) for neg_score, player_id in self._keys[start:end]]
+
+
+class LeaderboardRows:
+    """Lazy (username, score, song, perfect, good) rows for LeaderboardPaginationView.
+
+    Only the rows of the page being shown are ever built.
+    """
+
+    def __init__(self, leaderboards, instrument):
+        self.leaderboards = leaderboards
+        self.instrument = instrument.lower() if instrument else None
+        self.board = leaderboards.board(instrument)
+
+    def __len__(self):
+        return len(self.board)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, end, _ = index.indices(len(self.board))
+        return [self.leaderboards.row(player_id, self.instrument) for player_id, _ in self.board.page(start, end)]
+
+
+class Leaderboards:
+    """Materialized best-single-score leaderboards, one per instrument plus a global one.
+
+    Built once from player data, then kept current by score_changed() after every write.
+    """
+
+    def __init__(self, data, song_catalog):
+        self.data = data
+        self.song_catalog = song_catalog
+        self._best = {}            # (player_id, instrument) -> (score, song)
+        self._global_best = {}     # player_id -> (score, song, instrument)
+        self._boards = {None: SortedBoard()}
+        for player_id, player_data in data.items():
+            for instrument, instrument_data in player_data.items():
+                if isinstance(instrument_data, dict) and "songs" in instrument_data:
+                    self._refresh_instrument(player_id, instrument)
+            self._refresh_global(player_id)
+
+    def board(self, instrument=None):
+        key = instrument.lower() if instrument else None
+        return self._boards.setdefault(key, SortedBoard())
+
+    def rows(self, instrument=None):
+        return LeaderboardRows(self, instrument)
+
+    def row(self, player_id, instrument=None):
+        player_data = self.data.get(player_id, {})
+        username = player_data.get("username", f"User {player_id}")
+        if instrument:
+            score, song = self._best[(player_id, instrument)]
+        else:
+            score, song, instrument = self._global_best[player_id]
+        perfect, good = calculate_notes(score, get_song_metadata(song, instrument, self.song_catalog))
+        return username, score, song, perfect, good
+
+    def score_changed(self, player_id, instrument, song_name, score):
+        """Updates the boards after a single song score was written."""
+        key = (player_id, instrument)
+        best = self._best.get(key)
+        if get_song_metadata(song_name, instrument, self.song_catalog) is None:
+            return
+        if best is None or score > best[0]:
+            self._best[key] = (score, song_name)
+            self.board(instrument).update(player_id, score)
+        elif best[1] == song_name and score < best[0]:
+            # The best song went down (manual correction), rescan this player's songs
+            self._refresh_instrument(player_id, instrument)
+        else:
+            return
+        self._refresh_global(player_id)
+
+    def _refresh_instrument(self, player_id, instrument):
+        key = (player_id, instrument)
+        best = None
+        for song_name, score in self.data[player_id][instrument]["songs"].items():
+            if get_song_metadata(song_name, instrument, self.song_catalog) is None:
+                continue
+            if best is None or score > best[0]:
+                best = (score, song_name)
+        if best is None:
+            self._best.pop(key, None)
+            self.board(instrument).remove(player_id)
+        else:
+            self._best[key] = best
+            self.board(instrument).update(player_id, best[0])
+
+    def _refresh_global(self, player_id):
+        best = None
+        for instrument in self.data.get(player_id, {}):
+            instrument_best = self._best.get((player_id, instrument))
+            if instrument_best and (best is None or instrument_best[0] > best[0]):
+                best = (*instrument_best, instrument)
+        if best is None:
+            self._global_best.pop(player_id, None)
+            self._boards[None].remove(player_id)
+        else:
+            self._global_best[player_id] = best
+            self._boards[None].update(player_id, best[0])
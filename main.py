@@ -1,4 +1,48 @@
-import subprocess
+import asyncio
+import signal
 
-subprocess.Popen(["python", "E:/sites/Mochis_Tournament/bot_status.py"])
-subprocess.Popen(["python", "E:/sites/Mochis_Tournament/commands.py"])
+from config import bot, bot_token
+
+# Single entry point: status handling and the slash commands are loaded as extensions on the one
+# Bot from config.py, so there is one gateway connection, one heartbeat and one member cache.
+#
+# Startup:  storage loads on import -> extensions load -> login and connect -> on_ready
+#           (status channels, command sync, background tasks)
+# Shutdown: status set to offline -> gateway closed -> background tasks stopped ->
+#           OCR workers closed -> score journal compacted
+
+EXTENSIONS = ("bot_status", "commands")
+
+
+async def main():
+    loop = asyncio.get_running_loop()
+    shutdown_task = None
+
+    def start_shutdown():
+        nonlocal shutdown_task
+        if shutdown_task is None:
+            # Looked up via bot.extensions: load_extension owns these modules, importing them too would run them twice
+            shutdown_task = asyncio.create_task(bot.extensions["bot_status"].close_bot())
+
+    def shutdown_signal_handler(signum, frame):
+        print("Received shutdown signal. Shutting down gracefully...")
+        loop.call_soon_threadsafe(start_shutdown)
+
+    # Ctrl+C, closing the terminal, or a stop from the process supervisor
+    signal.signal(signal.SIGINT, shutdown_signal_handler)
+    signal.signal(signal.SIGTERM, shutdown_signal_handler)
+
+    async with bot:
+        for extension in EXTENSIONS:
+            await bot.load_extension(extension)
+        try:
+            await bot.start(bot_token)
+        finally:
+            if shutdown_task is not None:
+                await shutdown_task
+            await bot.extensions["commands"].stop_background_tasks()
+            print("Shutdown complete.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from image_processing import PREPROCESS_PARAMS, SCALE_FACTORS, locate_stats_rows, prepare_images, ocr_at_scale, settle_results
+from ocr_labels import FIELDS
+
+# Runs the OCR pipeline over a directory of labeled result screenshots and reports speed and accuracy
+# per scale, optionally for a second set of preprocessing params next to the current ones.
+#
+#   python ocr_benchmark.py screenshots/ labels.json
+#   python ocr_benchmark.py screenshots/ labels.json --compare params.json --output bench.json
+#
+# labels.json maps file names to the expected counts, either [perfect, good, missed, striked] or
+# {"perfect": ..., "good": ..., "missed": ..., "striked": ...}. params.json holds PREPROCESS_PARAMS
+# overrides. Every scale is run on every image (no early exit, no caches) in this process, so the
+# numbers are per image and comparable between runs. CPU time includes the Tesseract subprocesses
+# where the OS reports them (not on Windows).
+
+
+def load_labels(path):
+    with open(path, "r", encoding="utf-8") as file:
+        labels = json.load(file)
+    return {
+        name: tuple(expected[field] for field in FIELDS) if isinstance(expected, dict) else tuple(expected)
+        for name, expected in labels.items()
+    }
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def timed(func, *args):
+    wall, cpu = time.perf_counter(), cpu_seconds()
+    result = func(*args)
+    return result, time.perf_counter() - wall, cpu_seconds() - cpu
+
+
+def summarize(seconds):
+    if not seconds:
+        return {}
+    ordered = sorted(seconds)
+    return {
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def run_config(images, rows_by_image, params, scales):
+    """Benchmarks one set of preprocessing params over every labeled image."""
+    per_scale = {scale: {"seconds": [], "cpu_seconds": 0.0, "matches": 0} for scale in scales}
+    prepare_seconds = []
+    matched = 0
+    failures = []
+    wall_start, cpu_start = time.perf_counter(), cpu_seconds()
+
+    for name, (image_bytes, expected) in images.items():
+        rows = rows_by_image[name]
+        prepared, wall, _ = timed(prepare_images, image_bytes, rows, params)
+        prepare_seconds.append(wall)
+
+        results = {}
+        for scale in scales:
+            (counts, _), wall, cpu = timed(ocr_at_scale, prepared, scale, bool(rows))
+            results[scale] = counts
+            stats = per_scale[scale]
+            stats["seconds"].append(wall)
+            stats["cpu_seconds"] += cpu
+            stats["matches"] += counts == expected
+
+        winning_scale = next((scale for scale in scales if results[scale] == expected), None)
+        if settle_results(results, winning_scale, expected) == expected:
+            matched += 1
+        else:
+            failures.append({"file": name, "expected": expected, "read": {str(s): r for s, r in results.items()}})
+
+    return {
+        "params": params,
+        "images": len(images),
+        "exact_match_rate": round(matched / len(images), 4) if images else 0.0,
+        "wall_seconds": round(time.perf_counter() - wall_start, 3),
+        "cpu_seconds": round(cpu_seconds() - cpu_start, 3),
+        "prepare": summarize(prepare_seconds),
+        "scales": {
+            str(scale): {
+                **summarize(stats["seconds"]),
+                "cpu_seconds": round(stats["cpu_seconds"], 3),
+                "match_rate": round(stats["matches"] / len(images), 4) if images else 0.0,
+            }
+            for scale, stats in per_scale.items()
+        },
+        "failures": failures,
+    }
+
+
+def run_benchmark(directory, labels, configs, scales=SCALE_FACTORS, use_rows=True):
+    images = {}
+    for name, expected in labels.items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            print(f"Skipping {name}: not found in {directory}", file=sys.stderr)
+            continue
+        with open(path, "rb") as file:
+            images[name] = (file.read(), expected)
+
+    # The results panel lookup doesn't depend on the params, so it's timed once and shared
+    rows_by_image = {}
+    locate_seconds = []
+    for name, (image_bytes, _) in images.items():
+        if use_rows:
+            rows_by_image[name], wall, _ = timed(locate_stats_rows, image_bytes)
+            locate_seconds.append(wall)
+        else:
+            rows_by_image[name] = None
+
+    return {
+        "directory": directory,
+        "scales": list(scales),
+        "locate_rows": {**summarize(locate_seconds), "found": sum(rows is not None for rows in rows_by_image.values())},
+        "configs": {label: run_config(images, rows_by_image, params, scales) for label, params in configs.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark OCR speed and accuracy on labeled screenshots.")
+    parser.add_argument("directory", help="Directory with the result screenshots")
+    parser.add_argument("labels", help="JSON file mapping file names to expected counts")
+    parser.add_argument("--compare", metavar="PARAMS_JSON", help="PREPROCESS_PARAMS overrides to benchmark as well")
+    parser.add_argument("--scales", help="Comma separated scale factors (default: all of SCALE_FACTORS)")
+    parser.add_argument("--full-image", action="store_true", help="OCR the whole screenshot instead of the panel rows")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    configs = {"current": dict(PREPROCESS_PARAMS)}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            configs["compare"] = {**PREPROCESS_PARAMS, **json.load(file)}
+    scales = [float(scale) for scale in args.scales.split(",")] if args.scales else SCALE_FACTORS
+
+    report = run_benchmark(args.directory, load_labels(args.labels), configs, scales, use_rows=not args.full_image)
+
+    for label, result in report["configs"].items():
+        print(f"{label}: {result['exact_match_rate']:.1%} exact matches over {result['images']} images, "
+              f"{result['wall_seconds']}s wall, {result['cpu_seconds']}s CPU", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from bisect import bisect_left
+
 from constants import INSTRUMENT_THRESHOLDS, TOP_PERFORMANCES, DECAY_RATE, NAMED_RANK_TOP_PERFORMANCES, RANK_THRESHOLDS
 
 def determine_rank(score, instrument=None):
@@ -36,17 +38,9 @@ def get_user_instrument_data(username, instrument, data):
     return None
 
 
-# MAKE SURE TO NORMALISE THE SONG INFO BEFORE USING THIS COMMAND - CASE INSENTITIVE MATCHNG. SEE EXAMPLE BELOW
-# normalized_song_info = {
-#             k.lower(): {song.lower().strip(): v for song, v in v.items()} for k, v in song_info.items()
-#         }
-def get_song_metadata(song_name, instrument, song_info):
-    instrument_key = instrument.lower()
-    song_key = song_name.lower().strip()
-    
-    if instrument_key in song_info and song_key in song_info[instrument_key]:
-        return song_info[instrument_key][song_key]
-    return None
+# song_catalog is the SongCatalog from json_utils.get_song_catalog() - lookups are case-insensitive
+def get_song_metadata(song_name, instrument, song_catalog):
+    return song_catalog.get(instrument, song_name)
 
 def calculate_notes(score, song_metadata):
     if song_metadata:
@@ -69,3 +63,92 @@ def reverse_normalized_score(normalized_score, missed, striked, difficulty, tota
 
     return perfect, good
 
+
+class TopScores:
+    """One player's top TOP_PERFORMANCES scores on an instrument, best first.
+
+    Keeps the decay-weighted sum cached. When a single song improves, only the
+    positions between its new and old slot shift, so the sum is patched over that
+    range (O(K)) instead of re-sorting every score.
+    """
+
+    WEIGHTS = [DECAY_RATE ** i for i in range(TOP_PERFORMANCES)]
+
+    def __init__(self, songs):
+        ranked = sorted(songs.items(), key=lambda item: item[1], reverse=True)[:TOP_PERFORMANCES]
+        self.song_names = [song for song, _ in ranked]
+        self.scores = [score for _, score in ranked]
+        self.weighted_sum = sum(score * weight for score, weight in zip(self.scores, self.WEIGHTS))
+
+    def _range_sum(self, start, end):
+        return sum(self.scores[i] * self.WEIGHTS[i] for i in range(start, min(end, len(self.scores))))
+
+    def improve(self, song_name, score):
+        """Raises a song's score. Returns False if the new score doesn't change the top K."""
+        old_position = self.song_names.index(song_name) if song_name in self.song_names else None
+        if old_position is not None and score <= self.scores[old_position]:
+            return False
+        if old_position is None and len(self.scores) == TOP_PERFORMANCES and score <= self.scores[-1]:
+            return False
+
+        # Scores are descending, so bisect on the negated values
+        new_position = bisect_left([-s for s in self.scores], -score)
+        end = len(self.scores) if old_position is None else old_position + 1
+        self.weighted_sum -= self._range_sum(new_position, end)
+
+        if old_position is not None:
+            del self.scores[old_position]
+            del self.song_names[old_position]
+        self.scores.insert(new_position, score)
+        self.song_names.insert(new_position, song_name)
+        if len(self.scores) > TOP_PERFORMANCES:
+            self.scores.pop()
+            self.song_names.pop()
+        if old_position is None:
+            end = len(self.scores)
+
+        self.weighted_sum += self._range_sum(new_position, end)
+        return True
+
+    def named_rank_average(self):
+        top = self.scores[:NAMED_RANK_TOP_PERFORMANCES]
+        return sum(top) / len(top) if top else 0
+
+
+class RankingEngine:
+    """Incremental final-rank / named-rank bookkeeping for every player-instrument.
+
+    TopScores are built lazily from the stored songs the first time a player-instrument
+    is touched, then patched on every submission.
+    """
+
+    def __init__(self):
+        self._tops = {}
+
+    def top_scores(self, player_id, instrument, songs):
+        key = (player_id, instrument)
+        if key not in self._tops:
+            self._tops[key] = TopScores(songs)
+        return self._tops[key]
+
+    def submit(self, player_id, instrument, songs, song_name, score):
+        """Applies a new score for one song and returns (final_rank_score, named_rank).
+
+        songs is the player's stored {song: score} for the instrument before this score is written.
+        """
+        top = self.top_scores(player_id, instrument, songs)
+        current = songs.get(song_name)
+        if current is not None and score < current:
+            # A score went down (manual correction), rebuild from the full song list
+            top = self._tops[(player_id, instrument)] = TopScores({**songs, song_name: score})
+        else:
+            top.improve(song_name, score)
+        return top.weighted_sum, determine_rank(top.named_rank_average(), instrument)
+
+    def forget(self, player_id=None):
+        """Drops cached state for one player, or everyone (e.g. after a bulk re-rank)."""
+        if player_id is None:
+            self._tops.clear()
+        else:
+            for key in [key for key in self._tops if key[0] == player_id]:
+                del self._tops[key]
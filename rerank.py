@@ -0,0 +1,103 @@
+import sys
+import time
+
+import numpy as np
+
+from constants import INSTRUMENT_THRESHOLDS, RANK_THRESHOLDS, TOP_PERFORMANCES, DECAY_RATE, NAMED_RANK_TOP_PERFORMANCES
+
+# Bulk re-rank of every player after DECAY_RATE, TOP_PERFORMANCES, NAMED_RANK_TOP_PERFORMANCES or the
+# thresholds in constants.py change. Gives the same results as running save_data for everyone, but
+# does the sorting, decay-weighted sums and top-5 averages for all players at once in NumPy.
+#
+#   python rerank.py              (with the bot stopped)
+#   /rerank_all                   (admin slash command, while the bot is running)
+
+
+def collect_scores(data):
+    """Flattens player data into (keys, lengths, scores) arrays, one row per player-instrument."""
+    keys = []
+    lengths = []
+    scores = []
+    for player_id, player_data in data.items():
+        for instrument, instrument_data in player_data.items():
+            if not isinstance(instrument_data, dict) or "songs" not in instrument_data:
+                continue
+            songs = instrument_data["songs"]
+            keys.append((player_id, instrument))
+            lengths.append(len(songs))
+            scores.extend(songs.values())
+    return keys, np.asarray(lengths, dtype=np.int64), np.asarray(scores, dtype=np.float64)
+
+
+def _assign_ranks(values, instruments):
+    """Vectorized determine_rank(): searchsorted of each value against its instrument's thresholds."""
+    ranks = np.empty(len(values), dtype=object)
+    for instrument in set(instruments.tolist()):
+        thresholds = INSTRUMENT_THRESHOLDS.get(instrument.lower(), RANK_THRESHOLDS)
+        names = np.array(list(thresholds.keys())[::-1], dtype=object)
+        cutoffs = np.array(list(thresholds.values())[::-1], dtype=np.float64)
+        mask = instruments == instrument
+        positions = np.searchsorted(cutoffs, values[mask], side="right") - 1
+        # Anything under the lowest threshold falls back to Bronze, as determine_rank does
+        ranks[mask] = np.where(positions >= 0, names[np.clip(positions, 0, None)], "Bronze")
+    return ranks
+
+
+def compute_ranks(keys, lengths, scores):
+    """Returns (final_rank_scores, ranks, named_ranks), aligned with keys."""
+    rows = len(keys)
+    if rows == 0:
+        empty = np.array([], dtype=object)
+        return np.array([], dtype=np.float64), empty, empty
+
+    row_ids = np.repeat(np.arange(rows), lengths)
+
+    # Sort by row, then score descending, and number each score's position within its row
+    order = np.lexsort((-scores, row_ids))
+    sorted_rows = row_ids[order]
+    sorted_scores = scores[order]
+    row_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    positions = np.arange(len(sorted_scores)) - row_starts[sorted_rows]
+
+    top = positions < TOP_PERFORMANCES
+    weights = np.power(DECAY_RATE, positions[top])
+    final_rank_scores = np.bincount(sorted_rows[top], weights=sorted_scores[top] * weights, minlength=rows)
+
+    named = positions < NAMED_RANK_TOP_PERFORMANCES
+    top_sums = np.bincount(sorted_rows[named], weights=sorted_scores[named], minlength=rows)
+    top_counts = np.minimum(lengths, NAMED_RANK_TOP_PERFORMANCES)
+    averages = np.divide(top_sums, top_counts, out=np.zeros(rows), where=top_counts > 0)
+
+    instruments = np.array([instrument for _, instrument in keys], dtype=object)
+    return final_rank_scores, _assign_ranks(final_rank_scores, instruments), _assign_ranks(averages, instruments)
+
+
+def apply_ranks(data, keys, final_rank_scores, ranks, named_ranks):
+    """Writes the computed fields back into the player data dict. Returns how many changed."""
+    changed = 0
+    for (player_id, instrument), final_rank_score, rank, named_rank in zip(keys, final_rank_scores.tolist(), ranks, named_ranks):
+        instrument_data = data.get(player_id, {}).get(instrument)
+        if instrument_data is None:
+            continue
+        new_fields = {"final_rank_score": final_rank_score, "rank": rank, "named_rank": named_rank}
+        if any(instrument_data.get(k) != v for k, v in new_fields.items()):
+            instrument_data.update(new_fields)
+            changed += 1
+    return changed
+
+
+def rerank_all(data):
+    """Re-ranks every player-instrument in place. Returns the number of entries that changed."""
+    keys, lengths, scores = collect_scores(data)
+    return apply_ranks(data, keys, *compute_ranks(keys, lengths, scores))
+
+
+if __name__ == "__main__":
+    from json_utils import player_store
+
+    start = time.perf_counter()
+    data = player_store.load()
+    changed = rerank_all(data)
+    player_store.save(data)
+    print(f"Re-ranked {len(data)} players ({changed} player-instruments changed) in {time.perf_counter() - start:.2f}s")
+    sys.exit(0)
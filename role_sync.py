@@ -0,0 +1,173 @@
+import asyncio
+import re
+import time
+
+import discord
+
+from constants import RANK_PRIORITY
+from json_utils import load_player_data
+
+# Instrument role names are "{prefix} - {named rank}", e.g. "🎸Lead - Gold"
+INSTRUMENT_ROLE_PREFIXES = {
+    "lead": "🎸Lead",
+    "vocals": "🎤Vocals",
+    "bass": "🎚️Bass",
+    "drums": "🥁Drums",
+    "pro lead": "🎸Pro Lead",
+    "pro bass": "🎚️Pro Bass",
+}
+INSTRUMENT_KEYWORDS = ["Lead", "Vocals", "Bass", "Drums", "Pro Lead", "Pro Bass"]
+
+# Songs needed on an instrument before its role is handed out
+MIN_SONGS_FOR_ROLE = 4
+# Instrument ranks needed before an overall rank role is handed out
+MIN_INSTRUMENTS_FOR_OVERALL = 4
+
+# Gap between role edits, keeps a resync of a whole guild under the per-route rate limit
+ROLE_EDIT_INTERVAL_SECONDS = 0.25
+
+
+def clean_role_name(role_name):
+    """Removes emoji prefixes and extra spaces from role names."""
+    return re.sub(r"[\U0001F300-\U0001FAD6]", "", role_name).strip()
+
+
+def average_rank_from_role_names(role_names):
+    """Returns the overall rank for a set of role names, or None if too few instruments are ranked."""
+    instrument_ranks = {}  # Track ranks per instrument
+    for role_name in role_names:
+        role_name = clean_role_name(role_name)
+        for rank in RANK_PRIORITY:
+            if rank in role_name:
+                for instrument in INSTRUMENT_KEYWORDS:
+                    if instrument in role_name:
+                        instrument_ranks[instrument] = rank
+                        break
+
+    if len(instrument_ranks) < MIN_INSTRUMENTS_FOR_OVERALL:
+        return None
+
+    # Determine the highest common rank across instruments
+    for rank in RANK_PRIORITY:
+        if rank in instrument_ranks.values():
+            return rank
+    return None
+
+
+def desired_roles(member, player_data):
+    """Works out the member's full role list from their stored ranks.
+
+    Only instrument roles with enough scores and the overall rank role are managed,
+    every other role the member has is kept as is.
+    """
+    guild_roles = {role.name: role for role in member.guild.roles}
+    roles = {role.id: role for role in member.roles if not role.is_default()}
+
+    for instrument, prefix in INSTRUMENT_ROLE_PREFIXES.items():
+        instrument_data = player_data.get(instrument)
+        if not instrument_data or len(instrument_data.get("songs", {})) < MIN_SONGS_FOR_ROLE:
+            continue
+        role_name = f"{prefix} - {instrument_data.get('named_rank', 'Bronze')}"
+        role = guild_roles.get(role_name)
+        if not role:
+            print(f"Role '{role_name}' does not exist. Please ensure it is created beforehand.")
+            continue
+        for role_id, existing_role in list(roles.items()):
+            if existing_role.name.startswith(f"{prefix} - "):
+                del roles[role_id]
+        roles[role.id] = role
+
+    average_rank = average_rank_from_role_names(role.name for role in roles.values())
+    if average_rank:
+        overall_role = guild_roles.get(average_rank)
+        if overall_role:
+            for role_id, existing_role in list(roles.items()):
+                if existing_role.name in RANK_PRIORITY:
+                    del roles[role_id]
+            roles[overall_role.id] = overall_role
+        else:
+            print(f"Role '{average_rank}' does not exist. Please ensure it is created beforehand.")
+
+    return list(roles.values())
+
+
+async def sync_member(member):
+    """Brings a member's rank roles in line with stored data in one edit. Returns True if roles changed."""
+    player_data = load_player_data().get(str(member.id))
+    if not player_data:
+        return False
+
+    roles = desired_roles(member, player_data)
+    current = {role.id for role in member.roles if not role.is_default()}
+    if {role.id for role in roles} == current:
+        return False
+
+    await member.edit(roles=roles, reason="Rank role sync")
+    return True
+
+
+class RoleSyncQueue:
+    """Coalescing queue of members waiting for a role sync.
+
+    A member queued several times before the worker gets to them is synced once,
+    against whatever is stored at that point. The worker spaces edits out and
+    backs off when Discord answers with a 429.
+    """
+
+    def __init__(self, interval=ROLE_EDIT_INTERVAL_SECONDS):
+        self.interval = interval
+        self._queue = asyncio.Queue()
+        self._pending = set()
+        self._retry_at = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def enqueue(self, member):
+        key = (member.guild.id, member.id)
+        if key not in self._pending:
+            self._pending.add(key)
+            self._queue.put_nowait(key)
+
+    def resync_all(self, guilds):
+        """Queues every member with stored player data. Returns how many were queued."""
+        data = load_player_data()
+        queued = 0
+        for guild in guilds:
+            for player_id in data:
+                member = guild.get_member(int(player_id))
+                if member:
+                    self.enqueue(member)
+                    queued += 1
+        return queued
+
+    async def run(self, bot):
+        while True:
+            guild_id, member_id = await self._queue.get()
+            self._pending.discard((guild_id, member_id))
+
+            delay = self._retry_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            guild = bot.get_guild(guild_id)
+            member = guild.get_member(member_id) if guild else None
+            if member is None:
+                continue
+
+            try:
+                if await sync_member(member):
+                    await asyncio.sleep(self.interval)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    retry_after = getattr(e, "retry_after", None) or 5
+                    print(f"Rate limited syncing roles for {member.name}, retrying in {retry_after}s")
+                    self._retry_at = time.monotonic() + retry_after
+                    self.enqueue(member)
+                else:
+                    print(f"Error syncing roles for {member.name}: {e}")
+            except Exception as e:
+                print(f"Error syncing roles for {member.name}: {e}")
+
+
+role_sync_queue = RoleSyncQueue()
@@ -0,0 +1,90 @@
+import json
+import os
+
+# {"player_id": "...", "username": "...", "instrument": "drums", "song": "Everlong", "score": 645.38,
+#  "fields": {"final_rank_score": ..., "rank": "...", "named_rank": "..."}}
+
+
+def apply_entry(data, entry):
+    """Applies one journaled score write to a player data dict."""
+    player = data.setdefault(entry["player_id"], {"username": entry.get("username") or "Unknown"})
+    instrument_data = player.setdefault(entry["instrument"], {"songs": {}})
+    instrument_data.setdefault("songs", {})[entry["song"]] = entry["score"]
+    instrument_data.update(entry.get("fields", {}))
+
+
+class ScoreJournal:
+    """Append-only JSON-lines log of score writes.
+
+    Every append is flushed and fsync'd before returning, so an accepted score
+    survives a crash. A torn last line (crash mid-append) is skipped on replay and
+    cut off before the next append, so new entries never end up glued onto it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = 0
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._drop_torn_tail()
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def _drop_torn_tail(self):
+        """Truncates the file back to its last complete line."""
+        try:
+            file = open(self.path, "rb+")
+        except FileNotFoundError:
+            return
+        with file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 4096)
+                file.seek(start)
+                newline = file.read(position - start).rfind(b"\n")
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                print(f"Dropping torn last line of {self.path} ({end - position} bytes)")
+                file.truncate(position)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def append_many(self, entries):
+        file = self._open()
+        file.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        file.flush()
+        os.fsync(file.fileno())
+        self.entries += len(entries)
+
+    def replay(self):
+        """Yields every complete entry currently in the journal."""
+        self.entries = 0
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Skipping unreadable score journal line {line_number} in {self.path}")
+                    continue
+                self.entries += 1
+                yield entry
+
+    def truncate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.flush()
+            os.fsync(file.fileno())
+        self.entries = 0
@@ -0,0 +1,156 @@
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+# Letters NFKD can't decompose into a base letter + accent
+_FOLD_SPECIAL = str.maketrans({
+    "æ": "ae", "œ": "oe", "ø": "o", "ß": "ss", "ł": "l", "đ": "d", "ð": "d", "þ": "th", "ı": "i",
+})
+_WORD_START = re.compile(r"(?:^|(?<=[\s\-_(\[/&.,!?'\"]))\S")
+
+# Match tiers, best first
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = range(5)
+
+# Share of the query's trigrams a name needs before it counts as a fuzzy match
+FUZZY_MIN_OVERLAP = 0.5
+
+
+def fold(text):
+    """Lowercases and strips accents so "Lux Æterna" and "lux aeterna" compare equal."""
+    text = text.casefold().translate(_FOLD_SPECIAL)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+def trigrams(text):
+    padded = f"  {text}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Prefix + trigram index over a set of names for autocomplete.
+
+    Names are folded once when added. A search walks two sorted lists (whole-name
+    prefixes and word prefixes) with bisect, then uses the trigram postings for
+    substring and typo-tolerant matches. Only one- and two-letter queries that the
+    prefixes can't fill fall back to a linear scan.
+    """
+
+    def __init__(self, names=()):
+        self._ids = {}                       # name -> id
+        self._names = []                     # id -> name (None once removed)
+        self._keys = []                      # id -> folded name
+        self._prefixes = []                  # sorted (folded name, id)
+        self._word_prefixes = []             # sorted (folded name from each word start, id)
+        self._trigrams = defaultdict(set)    # trigram -> ids
+        self._free_ids = []
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def add(self, name):
+        if name in self._ids:
+            return
+        key = fold(name)
+        if self._free_ids:
+            name_id = self._free_ids.pop()
+            self._names[name_id] = name
+            self._keys[name_id] = key
+        else:
+            name_id = len(self._names)
+            self._names.append(name)
+            self._keys.append(key)
+        self._ids[name] = name_id
+        insort(self._prefixes, (key, name_id))
+        for match in _WORD_START.finditer(key):
+            if match.start() > 0:
+                insort(self._word_prefixes, (key[match.start():], name_id))
+        for trigram in trigrams(key):
+            self._trigrams[trigram].add(name_id)
+
+    def remove(self, name):
+        name_id = self._ids.pop(name, None)
+        if name_id is None:
+            return
+        key = self._keys[name_id]
+        self._remove_sorted(self._prefixes, (key, name_id))
+        for match in _WORD_START.finditer(key):
+            if match.start() > 0:
+                self._remove_sorted(self._word_prefixes, (key[match.start():], name_id))
+        for trigram in trigrams(key):
+            postings = self._trigrams[trigram]
+            postings.discard(name_id)
+            if not postings:
+                del self._trigrams[trigram]
+        self._names[name_id] = None
+        self._free_ids.append(name_id)
+
+    @staticmethod
+    def _remove_sorted(entries, entry):
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    def search(self, query, limit=25, preferred=None):
+        """Returns up to `limit` names ranked by match quality.
+
+        preferred is an optional set of names that sort ahead of others in the same tier.
+        """
+        query = fold(query)
+        if not query:
+            return [self._names[name_id] for _, name_id in self._prefixes[:limit]]
+
+        best = {}  # id -> (tier, -overlap)
+
+        def offer(name_id, tier, overlap=1.0):
+            rank = (tier, -overlap)
+            if rank < best.get(name_id, (FUZZY + 1, 0)):
+                best[name_id] = rank
+
+        for sorted_entries, tier in ((self._prefixes, PREFIX), (self._word_prefixes, WORD_PREFIX)):
+            i = bisect_left(sorted_entries, (query, -1))
+            while i < len(sorted_entries) and sorted_entries[i][0].startswith(query):
+                name_id = sorted_entries[i][1]
+                offer(name_id, EXACT if self._keys[name_id] == query else tier)
+                i += 1
+
+        if len(query) < 3:
+            # Too short for trigrams; only bother scanning if prefixes didn't fill the list
+            if len(best) < limit:
+                for name_id, key in enumerate(self._keys):
+                    if self._names[name_id] is not None and query in key:
+                        offer(name_id, SUBSTRING)
+        else:
+            query_trigrams = trigrams(query)
+            counts = defaultdict(int)
+            for trigram in query_trigrams:
+                for name_id in self._trigrams.get(trigram, ()):
+                    counts[name_id] += 1
+            for name_id, shared in counts.items():
+                overlap = shared / len(query_trigrams)
+                if query in self._keys[name_id]:
+                    offer(name_id, SUBSTRING, overlap)
+                elif overlap >= FUZZY_MIN_OVERLAP:
+                    offer(name_id, FUZZY, overlap)
+
+        preferred = preferred or ()
+        ranked = heapq.nsmallest(
+            limit,
+            best.items(),
+            key=lambda item: (
+                item[1][0],
+                self._names[item[0]] not in preferred,
+                item[1][1],
+                len(self._keys[item[0]]),
+                self._keys[item[0]],
+            ),
+        )
+        return [self._names[name_id] for name_id, _ in ranked]
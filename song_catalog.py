@@ -0,0 +1,140 @@
+from array import array
+
+from constants import INSTRUMENTS
+from search_index import NameIndex
+
+# Value stored in the difficulty array when a song's difficulty hasn't been set yet ("X")
+UNKNOWN_DIFFICULTY = float("nan")
+
+
+def normalize_song_name(song_name):
+    return song_name.lower().strip()
+
+
+class SongCatalog:
+    """Indexed view of song_info.json, built once and kept in sync on every mutation.
+
+    - lookup by (instrument, song) is a single dict hit, case-insensitive on both keys
+    - canonical_name() maps any capitalization of a song to the name stored in the file
+    - difficulties / total_notes hold one flat array per instrument, aligned with song_names
+    - name_index serves song name autocomplete over the canonical names
+
+    song_info is the raw dict (original capitalization) that gets written back to disk.
+    """
+
+    def __init__(self, song_info):
+        self.song_info = song_info
+        self.rebuild()
+
+    def rebuild(self):
+        self._instrument_keys = {}   # "pro lead" -> "Pro Lead"
+        self._lookup = {}            # "pro lead" -> {"song name": metadata}
+        self._positions = {}         # "pro lead" -> {"song name": index into the arrays}
+        self._canonical = {}         # "song name" -> "Song Name"
+        self.name_index = NameIndex()
+        self.song_names = {}
+        self.difficulties = {}
+        self.total_notes = {}
+
+        for instrument, songs in self.song_info.items():
+            self._add_instrument(instrument)
+            for song_name, metadata in songs.items():
+                self._index_song(instrument, song_name, metadata)
+
+    def _add_instrument(self, instrument):
+        instrument_key = instrument.lower()
+        if instrument_key not in self._instrument_keys:
+            self._instrument_keys[instrument_key] = instrument
+            self._lookup[instrument_key] = {}
+            self._positions[instrument_key] = {}
+            self.song_names[instrument_key] = []
+            self.difficulties[instrument_key] = array("d")
+            self.total_notes[instrument_key] = array("i")
+        return instrument_key
+
+    def _index_song(self, instrument, song_name, metadata):
+        instrument_key = self._add_instrument(instrument)
+        song_key = normalize_song_name(song_name)
+        if song_key not in self._canonical:
+            self._canonical[song_key] = song_name
+            self.name_index.add(song_name)
+        self._lookup[instrument_key][song_key] = metadata
+
+        difficulty = metadata.get("difficulty", "X")
+        difficulty = UNKNOWN_DIFFICULTY if difficulty == "X" else float(difficulty)
+        total_notes = int(metadata.get("total_notes", 0))
+
+        positions = self._positions[instrument_key]
+        if song_key in positions:
+            i = positions[song_key]
+            self.difficulties[instrument_key][i] = difficulty
+            self.total_notes[instrument_key][i] = total_notes
+        else:
+            positions[song_key] = len(self.song_names[instrument_key])
+            self.song_names[instrument_key].append(song_name)
+            self.difficulties[instrument_key].append(difficulty)
+            self.total_notes[instrument_key].append(total_notes)
+
+    def instrument_key(self, instrument):
+        """Returns the instrument key as spelled in song_info.json, or None."""
+        return self._instrument_keys.get(instrument.lower())
+
+    def get(self, instrument, song_name):
+        """Returns the metadata dict for a song on an instrument, or None."""
+        songs = self._lookup.get(instrument.lower())
+        if songs is None:
+            return None
+        return songs.get(normalize_song_name(song_name))
+
+    def canonical_name(self, song_name, default=None):
+        """Returns the correctly-capitalized song name, or default if the song is unknown."""
+        return self._canonical.get(normalize_song_name(song_name), default)
+
+    def has_song(self, song_name):
+        return normalize_song_name(song_name) in self._canonical
+
+    def all_song_names(self):
+        return list(self._canonical.values())
+
+    def set_song(self, instrument, song_name, **metadata):
+        """Creates or updates a single song entry, touching only that entry's index slots."""
+        instrument_name = self.instrument_key(instrument) or instrument
+        songs = self.song_info.setdefault(instrument_name, {})
+        song_name = self._stored_name(instrument.lower(), song_name)
+        entry = songs.setdefault(song_name, {"difficulty": "X"})
+        entry.update(metadata)
+        self._index_song(instrument_name, song_name, entry)
+        return entry
+
+    def add_song(self, song_name):
+        """Adds a new song with an unset difficulty to every instrument."""
+        for instrument in INSTRUMENTS:
+            self.set_song(instrument, song_name)
+
+    def update(self, song_info):
+        """Syncs the catalog with a modified copy of song_info, re-indexing only changed entries."""
+        if song_info is self.song_info:
+            return
+        if set(song_info) != set(self.song_info) or any(
+            set(songs) != set(self.song_info[instrument]) for instrument, songs in song_info.items()
+        ):
+            # Songs were renamed or removed, positions can't be patched in place
+            self.song_info = song_info
+            self.rebuild()
+            return
+
+        for instrument, songs in song_info.items():
+            old_songs = self.song_info[instrument]
+            for song_name, metadata in songs.items():
+                old_metadata = old_songs[song_name]
+                # Entries edited in place share the same dict, so they can't be diffed
+                if old_metadata is metadata or old_metadata != metadata:
+                    self._index_song(instrument, song_name, metadata)
+        self.song_info = song_info
+
+    def _stored_name(self, instrument_key, song_name):
+        positions = self._positions.get(instrument_key, {})
+        song_key = normalize_song_name(song_name)
+        if song_key in positions:
+            return self.song_names[instrument_key][positions[song_key]]
+        return song_name
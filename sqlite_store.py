@@ -0,0 +1,242 @@
+import json
+import os
+import sqlite3
+import sys
+
+# Optional storage backend, enabled with STORAGE_BACKEND=sqlite in .env.
+# Same surface as json_utils.PlayerStore, plus song info, in a single WAL-mode database.
+# Run `python sqlite_store.py migrate` once to import the existing JSON files.
+#
+# The bot reads the whole player dict once and serves it from memory, so the tables are only
+# keyed for the row upserts; there are no secondary indexes to keep up on every write.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    player_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS player_instruments (
+    player_id TEXT NOT NULL REFERENCES players (player_id),
+    instrument TEXT NOT NULL,
+    final_rank_score REAL,
+    rank TEXT,
+    named_rank TEXT,
+    PRIMARY KEY (player_id, instrument)
+);
+
+CREATE TABLE IF NOT EXISTS songs (
+    instrument TEXT NOT NULL,
+    song TEXT NOT NULL,
+    difficulty REAL,
+    total_notes INTEGER,
+    PRIMARY KEY (instrument, song)
+);
+
+CREATE TABLE IF NOT EXISTS scores (
+    player_id TEXT NOT NULL REFERENCES players (player_id),
+    instrument TEXT NOT NULL,
+    song TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (player_id, instrument, song)
+);
+
+-- Created by earlier versions, never queried
+DROP INDEX IF EXISTS players_username;
+DROP INDEX IF EXISTS player_instruments_rank;
+DROP INDEX IF EXISTS scores_leaderboard;
+"""
+
+RANK_FIELDS = ("final_rank_score", "rank", "named_rank")
+
+
+class SqliteStore:
+    """Player, score and song storage backed by SQLite.
+
+    Reads of the full player dict are cached in memory like PlayerStore; score
+    writes are row upserts, batched into one transaction per WriteCoordinator
+    group commit, so concurrent submits no longer race on a read-modify-write
+    of one JSON file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = self._connect()
+        self.conn.executescript(SCHEMA)
+        self._writer = None
+        self._data = None
+        self._usernames = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    # ---------------------- players & scores ----------------------
+
+    def load(self):
+        if self._data is None:
+            data = {}
+            for player_id, username in self.conn.execute("SELECT player_id, username FROM players"):
+                data[player_id] = {"username": username}
+            for player_id, instrument, *fields in self.conn.execute(
+                "SELECT player_id, instrument, final_rank_score, rank, named_rank FROM player_instruments"
+            ):
+                instrument_data = data[player_id].setdefault(instrument, {"songs": {}})
+                instrument_data.update({k: v for k, v in zip(RANK_FIELDS, fields) if v is not None})
+            for player_id, instrument, song, score in self.conn.execute(
+                "SELECT player_id, instrument, song, score FROM scores"
+            ):
+                data[player_id].setdefault(instrument, {"songs": {}})["songs"][song] = score
+            self._data = data
+        return self._data
+
+    def usernames(self):
+        if self._usernames is None:
+            self._usernames = {username for (username,) in self.conn.execute("SELECT username FROM players")}
+        return self._usernames
+
+    def apply_score(self, player_id, username, instrument, song_name, score, **fields):
+        """Sets one song score in the cached player data. Returns the entry to persist."""
+        data = self.load()
+        if player_id not in data:
+            self._usernames = None
+        player = data.setdefault(player_id, {"username": username or "Unknown"})
+        instrument_data = player.setdefault(instrument, {"songs": {}})
+        instrument_data["songs"][song_name] = score
+        instrument_data.update(fields)
+        return (player_id, username, instrument, song_name, score, fields)
+
+    def _writer_conn(self):
+        # Opened on first use by the WriteCoordinator thread, sqlite3 connections stay on their thread
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    def persist(self, entries):
+        """Writes applied entries in one transaction. Runs on the WriteCoordinator thread."""
+        with self._writer_conn():
+            for entry in entries:
+                self._write_score(self._writer, *entry)
+
+    def _write_score(self, conn, player_id, username, instrument, song_name, score, fields):
+        conn.execute(
+            "INSERT OR IGNORE INTO players (player_id, username) VALUES (?, ?)",
+            (player_id, username or "Unknown"),
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO player_instruments (player_id, instrument) VALUES (?, ?)",
+            (player_id, instrument),
+        )
+        if fields:
+            columns = [k for k in RANK_FIELDS if k in fields]
+            conn.execute(
+                f"UPDATE player_instruments SET {', '.join(f'{k} = ?' for k in columns)} "
+                "WHERE player_id = ? AND instrument = ?",
+                [fields[k] for k in columns] + [player_id, instrument],
+            )
+        conn.execute(
+            "INSERT INTO scores (player_id, instrument, song, score) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (player_id, instrument, song) DO UPDATE SET score = excluded.score",
+            (player_id, instrument, song_name, score),
+        )
+
+    def checkpoint_due(self):
+        # SQLite checkpoints the WAL by itself as it grows
+        return False
+
+    def begin_checkpoint(self):
+        return None
+
+    def write_checkpoint(self, state):
+        self._writer_conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def end_checkpoint(self):
+        pass
+
+    def save(self, data=None):
+        """Replaces every player row with the given (or cached) player data dict."""
+        data = data if data is not None else self.load()
+        with self.conn:
+            self.conn.execute("DELETE FROM scores")
+            self.conn.execute("DELETE FROM player_instruments")
+            self.conn.execute("DELETE FROM players")
+            for player_id, player in data.items():
+                self.conn.execute(
+                    "INSERT INTO players (player_id, username) VALUES (?, ?)",
+                    (player_id, player.get("username", "Unknown")),
+                )
+                for instrument, instrument_data in player.items():
+                    if not isinstance(instrument_data, dict) or "songs" not in instrument_data:
+                        continue
+                    self.conn.execute(
+                        "INSERT INTO player_instruments (player_id, instrument, final_rank_score, rank, named_rank) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (player_id, instrument, *(instrument_data.get(k) for k in RANK_FIELDS)),
+                    )
+                    self.conn.executemany(
+                        "INSERT INTO scores (player_id, instrument, song, score) VALUES (?, ?, ?, ?)",
+                        [(player_id, instrument, song, score) for song, score in instrument_data["songs"].items()],
+                    )
+        self._data = data
+        self._usernames = None
+
+    # ---------------------- song info ----------------------
+
+    def load_song_info(self):
+        song_info = {}
+        for instrument, song, difficulty, total_notes in self.conn.execute(
+            "SELECT instrument, song, difficulty, total_notes FROM songs ORDER BY rowid"
+        ):
+            metadata = {"difficulty": "X" if difficulty is None else difficulty}
+            if total_notes is not None:
+                metadata["total_notes"] = total_notes
+            song_info.setdefault(instrument, {})[song] = metadata
+        return song_info
+
+    def save_song_info(self, song_info):
+        rows = [
+            (
+                instrument,
+                song,
+                None if metadata.get("difficulty", "X") == "X" else float(metadata["difficulty"]),
+                metadata.get("total_notes"),
+            )
+            for instrument, songs in song_info.items()
+            for song, metadata in songs.items()
+        ]
+        # Replaced wholesale like song_info.json, so removed songs go and the order is kept
+        with self.conn:
+            self.conn.execute("DELETE FROM songs")
+            self.conn.executemany(
+                "INSERT INTO songs (instrument, song, difficulty, total_notes) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+
+def _load_json(path, default):
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    return default
+
+
+def migrate(db_path, player_data_file, song_info_file):
+    """One-shot import of the JSON files into a SQLite database."""
+    from json_utils import PlayerStore, SCORE_JOURNAL_FILE
+
+    store = SqliteStore(db_path)
+    store.save_song_info(_load_json(song_info_file, {}))
+    # Goes through PlayerStore so any un-compacted journal entries are included
+    store.save(PlayerStore(player_data_file, SCORE_JOURNAL_FILE).load())
+    print(f"Migrated {len(store.load())} players and {len(store.load_song_info())} instruments into {db_path}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["migrate"]:
+        print("Usage: python sqlite_store.py migrate [database path]")
+        sys.exit(1)
+    from json_utils import PLAYER_DATA_FILE, SONG_INFO_DATA_FILE, SQLITE_DATA_FILE
+    migrate(sys.argv[2] if len(sys.argv) > 2 else SQLITE_DATA_FILE, PLAYER_DATA_FILE, SONG_INFO_DATA_FILE)
@@ -0,0 +1,111 @@
+from heapq import nlargest
+
+from constants import NAMED_RANK_TOP_PERFORMANCES
+from leaderboards import SortedBoard
+
+# Boards kept per instrument: the decay-weighted final rank score, and the top-N average named ranks use
+FINAL_RANK = "final_rank_score"
+NAMED_RANK_AVERAGE = "named_rank_average"
+NEIGHBOURS = 5
+
+
+def named_rank_average(songs):
+    top_scores = nlargest(NAMED_RANK_TOP_PERFORMANCES, songs.values())
+    return sum(top_scores) / len(top_scores) if top_scores else 0
+
+
+class Standing:
+    """Where a player sits on one board. position is 1-based; neighbours are (player_id, score, position)."""
+
+    __slots__ = ("player_id", "score", "position", "total", "neighbours")
+
+    def __init__(self, player_id, score, position, total, neighbours):
+        self.player_id = player_id
+        self.score = score
+        self.position = position
+        self.total = total
+        self.neighbours = neighbours
+
+    @property
+    def percentile(self):
+        """Share of ranked players placed below this one, 0-100."""
+        return 100 * (self.total - self.position) / self.total
+
+    @property
+    def top_percent(self):
+        return 100 * self.position / self.total
+
+
+class Standings:
+    """Per-instrument rank queries over the stored final rank scores and named-rank averages.
+
+    Each board is a SortedBoard, so a player's position is a bisect and the players
+    around them are a slice; update() after every score write keeps them current.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.rebuild()
+
+    def rebuild(self):
+        self._boards = {}
+        self._player_ids = {}  # lowercase username -> player_id
+        self._usernames = {}   # player_id -> the lowercase username indexed for them
+        for player_id in self.data:
+            self._index_player(player_id)
+
+    def _index_player(self, player_id):
+        self._index_username(player_id)
+        for instrument, instrument_data in self.data[player_id].items():
+            if isinstance(instrument_data, dict) and "songs" in instrument_data:
+                self.update(player_id, instrument)
+
+    def _index_username(self, player_id):
+        username = self.data.get(player_id, {}).get("username")
+        # Scores accepted from #pending-scores create players as "Unknown"
+        if not username or username == "Unknown":
+            return
+        username = username.lower()
+        previous = self._usernames.get(player_id)
+        if previous == username:
+            return
+        # Renamed: the old name no longer points at this player
+        if previous is not None and self._player_ids.get(previous) == player_id:
+            del self._player_ids[previous]
+        self._usernames[player_id] = username
+        self._player_ids[username] = player_id
+
+    def board(self, instrument, kind=FINAL_RANK):
+        return self._boards.setdefault((instrument.lower(), kind), SortedBoard())
+
+    def player_id(self, username):
+        """Returns the player ID stored for a username (case-insensitive), or None."""
+        return self._player_ids.get(username.lower())
+
+    def update(self, player_id, instrument):
+        """Re-reads one player-instrument from the player data after a write."""
+        self._index_username(player_id)
+        instrument_data = self.data.get(player_id, {}).get(instrument)
+        final_board = self.board(instrument, FINAL_RANK)
+        named_board = self.board(instrument, NAMED_RANK_AVERAGE)
+        if not isinstance(instrument_data, dict) or not instrument_data.get("songs"):
+            final_board.remove(player_id)
+            named_board.remove(player_id)
+            return
+
+        if instrument_data.get("final_rank_score") is not None:
+            final_board.update(player_id, instrument_data["final_rank_score"])
+        named_board.update(player_id, named_rank_average(instrument_data["songs"]))
+
+    def standing(self, player_id, instrument, kind=FINAL_RANK, neighbours=NEIGHBOURS):
+        """Returns the player's Standing on an instrument board, or None if they aren't on it."""
+        board = self.board(instrument, kind)
+        index = board.position(player_id)
+        if index is None:
+            return None
+        start = max(0, index - neighbours)
+        around = [
+            (other_id, score, start + offset + 1)
+            for offset, (other_id, score) in enumerate(board.page(start, index + neighbours + 1))
+        ]
+        return Standing(player_id, board.score(player_id), index + 1, len(board), around)
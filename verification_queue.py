@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+import discord
+
+from discord_utils import pending_scores
+from image_processing import ocr_service
+
+VERIFICATION_QUEUE_FILE = "verification_queue.json"
+
+# Lower runs first. New high scores move ranks and leaderboards, so their proofs are checked before the rest
+PRIORITY_HIGH_SCORE = 0
+PRIORITY_DEFAULT = 1
+
+# A job that errors is retried after RETRY_DELAY_SECONDS, doubling each time; after the last
+# attempt it goes to #pending-scores for manual review instead
+MAX_VERIFY_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 30
+
+
+class VerificationQueue:
+    """Proof screenshots waiting for OCR verification, persisted so a restart doesn't lose them.
+
+    Jobs are plain dicts, written to VERIFICATION_QUEUE_FILE on every enqueue and
+    completion; a job is only dropped once its result has been posted, or once it has
+    been sent for manual review after MAX_VERIFY_ATTEMPTS errors. The OCR reading and
+    the failure notice are saved in the job as they finish, so a retry picks up after
+    the last step that worked instead of repeating it. Workers take
+    the lowest priority first, oldest first within a priority. There are as many
+    workers as OcrService runs jobs at once, so queued proofs never hit OcrBusyError.
+    """
+
+    def __init__(self, path=VERIFICATION_QUEUE_FILE, workers=None):
+        self.path = path
+        self.workers = workers or ocr_service.max_jobs
+        self._queue = asyncio.PriorityQueue()
+        self._jobs = {}  # job_id -> job, everything not finished yet
+        self._loaded = False
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def load(self):
+        """Queues the jobs left in the file by the previous run. Returns how many were resumed."""
+        if self._loaded:
+            return 0
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                jobs = json.load(file)
+        except FileNotFoundError:
+            return 0
+        except json.JSONDecodeError as e:
+            print(f"Error reading {self.path}, starting with an empty verification queue: {e}")
+            return 0
+        for job in jobs:
+            self._put(job)
+        return len(jobs)
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(list(self._jobs.values()), file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _put(self, job):
+        self._jobs[job["job_id"]] = job
+        self._queue.put_nowait((job["priority"], job["submitted_at"], job["job_id"]))
+
+    def enqueue(self, guild_id, channel_id, submitter_id, player_id, username, instrument, song_name,
+                claimed, image_url, embed, priority=PRIORITY_DEFAULT):
+        """Queues a proof for verification. Returns the job's position in the queue."""
+        self.load()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "priority": priority,
+            "submitted_at": time.time(),
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "submitter_id": submitter_id,
+            "player_id": player_id,
+            "username": username,
+            "instrument": instrument,
+            "song": song_name,
+            "claimed": list(claimed),
+            "image_url": image_url,
+            # The confirmation embed, reused for #pending-scores if the proof doesn't match
+            "embed": embed.to_dict(),
+        }
+        self._put(job)
+        self._save()
+        return sum(
+            1 for other in self._jobs.values()
+            if (other["priority"], other["submitted_at"]) <= (job["priority"], job["submitted_at"])
+        )
+
+    async def run(self, bot):
+        resumed = self.load()
+        if resumed:
+            print(f"Resuming {resumed} queued score verifications")
+        await asyncio.gather(*(self._worker(bot) for _ in range(self.workers)))
+
+    async def _worker(self, bot):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            try:
+                await self._verify(bot, job)
+            except Exception as e:
+                job["attempts"] = job.get("attempts", 0) + 1
+                print(f"Error verifying {job['song']} on {job['instrument']} for {job['username']} "
+                      f"(attempt {job['attempts']} of {MAX_VERIFY_ATTEMPTS}): {e}")
+                if job["attempts"] < MAX_VERIFY_ATTEMPTS:
+                    delay = RETRY_DELAY_SECONDS * 2 ** (job["attempts"] - 1)
+                    asyncio.get_running_loop().call_later(delay, self._requeue, job_id)
+                    self._save()
+                    continue
+                try:
+                    await self._fail(bot, job, "could not be completed")
+                except Exception as review_error:
+                    # Left in the file, so the next start picks it up again
+                    print(f"Error sending {job['username']}'s score for review, keeping it queued: {review_error}")
+                    self._save()
+                    continue
+            del self._jobs[job_id]
+            self._save()
+
+    def _requeue(self, job_id):
+        if job_id in self._jobs:
+            self._put(self._jobs[job_id])
+
+    async def _verify(self, bot, job):
+        claimed = tuple(job["claimed"])
+        if "extracted" not in job:
+            # Download errors, timeouts and a full OCR queue raise into the retry; only a finished reading is kept
+            job["extracted"] = list(await ocr_service.extract(job["image_url"], claimed))
+            self._save()
+
+        if tuple(job["extracted"]) == claimed:
+            channel = bot.get_channel(job["channel_id"])
+            if channel:
+                await channel.send(f"<@{job['submitter_id']}> Image verified successfully for {self._song(job)}!")
+            return
+
+        await self._fail(bot, job, "failed")
+
+    @staticmethod
+    def _song(job):
+        return f"`{job['song']}` on `{job['instrument']}`"
+
+    async def _fail(self, bot, job, reason):
+        """Tells the submitter (once per job) and sends the score to #pending-scores."""
+        if not job.get("notified"):
+            channel = bot.get_channel(job["channel_id"])
+            if channel:
+                await channel.send(
+                    f"<@{job['submitter_id']}> Image verification {reason} for {self._song(job)}, "
+                    "it has been sent for review."
+                )
+            job["notified"] = True
+            self._save()
+        await self._send_for_review(bot, job)
+
+    async def _send_for_review(self, bot, job):
+        guild = bot.get_guild(job["guild_id"])
+        if guild is None:
+            print(f"Guild {job['guild_id']} not found, can't send {job['username']}'s score for review")
+            return
+        await pending_scores(
+            discord.Embed.from_dict(job["embed"]), guild, job["player_id"], job["username"],
+            job["instrument"], job["song"], *job["claimed"],
+        )
+
+
+verification_queue = VerificationQueue()
@@ -0,0 +1,156 @@
+import asyncio
+import contextlib
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+# Writes arriving within this long of the first queued one are persisted together, with one fsync
+GROUP_COMMIT_WINDOW_SECONDS = 0.005
+GROUP_COMMIT_MAX_ENTRIES = 500
+
+
+class WriteCoordinator:
+    """Serializes every player data write through one writer task.
+
+    Callers apply a write to the in-memory data first, which is one synchronous
+    step on the event loop, so reads never wait on disk and never see half a
+    write. Then they await commit(). The writer gathers everything queued within
+    GROUP_COMMIT_WINDOW_SECONDS and persists it as one batch on its own thread:
+    one journal append + fsync, or one SQLite transaction. Checkpoints and bulk
+    replacement go through the same writer, so nothing touches the files at the
+    same time.
+
+    player_lock() keeps each player's read -> rank -> write sequences from
+    interleaving, e.g. two /submits for one player, or a /submit and an Accept
+    on #pending-scores. exclusive() holds every player_lock() back for a whole
+    bulk operation, so e.g. /rerank_all can't overwrite a score written between
+    its read and its replace_all().
+    """
+
+    def __init__(self, store, window=GROUP_COMMIT_WINDOW_SECONDS):
+        self.store = store
+        self.window = window
+        self._queue = asyncio.Queue()
+        self._io_lock = asyncio.Lock()
+        self._player_locks = weakref.WeakValueDictionary()  # player_id -> Lock, gone once nobody holds it
+        self._writes_open = asyncio.Event()  # Cleared while exclusive() is held
+        self._writes_open.set()
+        self._writers_idle = asyncio.Event()  # Set while nobody holds a player_lock()
+        self._writers_idle.set()
+        self._writers = 0
+        self._exclusive_lock = asyncio.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="player-data-writer")
+        self._task = None
+
+    @contextlib.asynccontextmanager
+    async def player_lock(self, player_id):
+        lock = self._player_locks.get(player_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._player_locks[player_id] = lock
+        while True:
+            await self._writes_open.wait()
+            await lock.acquire()
+            if self._writes_open.is_set():
+                break
+            # exclusive() started while we were waiting for the lock, let it go first
+            lock.release()
+        self._writers += 1
+        self._writers_idle.clear()
+        try:
+            yield
+        finally:
+            self._writers -= 1
+            if not self._writers:
+                self._writers_idle.set()
+            lock.release()
+
+    @contextlib.asynccontextmanager
+    async def exclusive(self):
+        """Blocks new player_lock() holders and waits out the current ones for the duration of the block."""
+        async with self._exclusive_lock:
+            self._writes_open.clear()
+            try:
+                await self._writers_idle.wait()
+                yield
+            finally:
+                self._writes_open.set()
+
+    def _start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def commit(self, entry):
+        """Queues an already applied write and returns once it's on disk."""
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((entry, future))
+        await future
+
+    async def flush(self):
+        """Returns once everything queued so far is on disk."""
+        await self.commit(None)
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.window)
+            while not self._queue.empty() and len(batch) < GROUP_COMMIT_MAX_ENTRIES:
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
+
+    async def _write(self, batch):
+        entries = [entry for entry, _ in batch if entry is not None]
+        try:
+            if entries:
+                async with self._io_lock:
+                    await self._in_thread(self.store.persist, entries)
+        except Exception as e:
+            print(f"Error writing {len(entries)} score(s): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+        try:
+            await self.maybe_checkpoint()
+        except Exception as e:
+            print(f"Error compacting score journal: {e}")
+
+    async def _in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def maybe_checkpoint(self):
+        async with self._io_lock:
+            if self.store.checkpoint_due():
+                await self._checkpoint()
+
+    async def checkpoint(self):
+        async with self._io_lock:
+            await self._checkpoint()
+
+    async def _checkpoint(self):
+        # The state is captured on the event loop, where the data can't change under it;
+        # only the file writing happens on the writer thread
+        state = self.store.begin_checkpoint()
+        await self._in_thread(self.store.write_checkpoint, state)
+        self.store.end_checkpoint()
+
+    async def replace_all(self, data):
+        """Swaps in a whole new data set (e.g. after /rerank_all) once everything queued is written."""
+        await self.flush()
+        async with self._io_lock:
+            self.store.save(data)
+
+    async def close(self):
+        """Writes out everything queued, checkpoints, and stops the writer."""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.checkpoint()
+        self._executor.shutdown(wait=True)